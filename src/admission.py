@@ -0,0 +1,140 @@
+"""Per-client rate limiting and cost-aware admission control for the API."""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from config import RATE_LIMITS, CONCURRENCY_LIMITS, RATE_LIMIT_MAX_CLIENTS
+
+CLIENT_ID_HEADER = "X-Client-Id"
+
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+WRITE = "write"
+
+
+class TokenBucket:
+    """
+    A token bucket refilled lazily on every take.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): The maximum number of tokens, i.e. the allowed burst.
+        tokens (float): The tokens currently available.
+        updated (float): The monotonic time of the last refill.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """
+        Takes one token if available.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available.
+        """
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiting per client and cost class, stored in process.
+
+    The least recently seen buckets are dropped beyond ``max_clients``, so a
+    flood of distinct clients cannot grow the memory used without bound.
+
+    Attributes:
+        limits (dict): Cost class to (rate per second, burst).
+        max_clients (int): The maximum number of buckets kept.
+        buckets (OrderedDict): (client, cost class) to TokenBucket.
+        lock (Lock): Guards the buckets across request threads.
+
+    Methods:
+        acquire(client, cost): Takes a token for a request.
+    """
+
+    def __init__(self, limits=None, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, client, cost):
+        """
+        Takes a token for a request of the given client and cost class.
+
+        Args:
+            client (str): Identifies the client.
+            cost (str): The cost class of the requested route.
+
+        Returns:
+            int: 0 if the request may proceed, otherwise the seconds to wait.
+        """
+        now = time.monotonic()
+        key = (client, cost)
+        with self.lock:
+            bucket = self.buckets.pop(key, None)
+            if bucket is None:
+                bucket = TokenBucket(*self.limits[cost])
+            self.buckets[key] = bucket
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            wait = bucket.take(now)
+        return math.ceil(wait)
+
+
+class AdmissionController:
+    """
+    Caps the number of requests of each cost class running at the same time.
+
+    Expensive routes get a small budget so they cannot take every worker
+    thread away from point lookups. A request over the budget is rejected at
+    once rather than queued.
+
+    Attributes:
+        slots (dict): Cost class to the semaphore holding its budget.
+
+    Methods:
+        admit(cost): Takes a slot for a request, if one is free.
+        release(cost): Gives a slot back.
+    """
+
+    def __init__(self, limits=None):
+        limits = CONCURRENCY_LIMITS if limits is None else limits
+        self.slots = {
+            cost: threading.BoundedSemaphore(limit) for cost, limit in limits.items()
+        }
+
+    def admit(self, cost):
+        """
+        Takes a slot for a request of the given cost class, without waiting.
+
+        Args:
+            cost (str): The cost class of the requested route.
+
+        Returns:
+            bool: True if the request was admitted, False otherwise.
+        """
+        return self.slots[cost].acquire(blocking=False)
+
+    def release(self, cost):
+        """
+        Gives back the slot of an admitted request.
+
+        Args:
+            cost (str): The cost class of the finished request.
+        """
+        self.slots[cost].release()
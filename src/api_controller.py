@@ -1,9 +1,32 @@
-"""Patient API Controller"""
+"""
+Patient API Controller
 
-from flask import Flask, request, jsonify
-from patient_db import PatientDB
-from patient_db_config import PATIENT_COLUMN_NAMES
-from patient_db_config import PATIENT_ID_COLUMN
+Importing this module only loads Flask. The database layer is imported when a
+controller is created, and the schema is created by an explicit init_schema()
+call, so tests, tools and forked workers do not pay for what they do not use.
+"""
+
+from flask import Flask, Response, request, jsonify, g
+from patient_columns import PATIENT_COLUMN_NAMES
+from patient_columns import PATIENT_ID_COLUMN, PATIENT_WARD_COLUMN
+from config import PROFILING_ADMIN_TOKEN, PROFILE_ALL_REQUESTS
+from config import RATE_LIMITING_ENABLED, TRUSTED_CLIENT_ADDRESSES
+import idempotency
+import admission
+from api_routing import WriteRouter, invalid_request, database_failure
+
+
+def create_app(writer_url=None):
+    """
+    Creates the Flask application serving the patient API.
+
+    Args:
+        writer_url (str, optional): URL of the writer process to forward writes to.
+
+    Returns:
+        Flask: The configured application.
+    """
+    return PatientAPIController(writer_url=writer_url).app
 
 
 class PatientAPIController:
@@ -13,35 +36,183 @@ class PatientAPIController:
     Attributes:
         app (Flask): The Flask application instance.
         patient_db (PatientDB): The patient database instance.
+        validator (PatientValidator): The compiled patient request validator.
+        trusted_addresses (frozenset): Addresses whose X-Client-Id header is
+        trusted to name the client.
+        write_router (WriteRouter): Registers the routes that modify the
+        database, forwarding them to the writer process in a read worker.
+        doctors (DoctorAPIController): Serves the doctor routes.
+        rate_limiter (RateLimiter): Token buckets per client and route cost
+        class, or None when rate limiting is disabled.
+        admission (AdmissionController): Concurrency budgets per route cost class.
+        profiler (RequestProfiler): The profiling middleware, or None when
+        profiling is not configured. Its profiles are served on the
+        /admin/profiles routes by a ProfileAPIController.
+        snapshot (ListSnapshot): The precomputed patient list, or None until
+        start_snapshot() is called.
 
     Methods:
-        setup_routes(): Sets up the routes for the API endpoints.
+        setup_routes(): Sets up the routes for the patient endpoints.
+        client_id(): Identifies the client of the current request.
+        route_cost(): Classifies the current request by cost.
+        admit_request(): Rate limits and admits the current request.
+        release_request(_exception): Releases the slot of a finished request.
         validate_patient_request_body(request_body): Validates the request body for
         creating a patient.
         row_to_dict(row_values): Converts a row of patient data to a dictionary.
-        create_patient(): Creates a new patient.
+        create_patient(): Creates a new patient, or several from a JSON array.
+        create_patients(request_body): Creates several patients at once.
+        include_archived(): Reads the include_archived query flag.
         get_patients(): Retrieves all patients.
         get_patient(patient_id): Retrieves a specific patient.
         update_patient(patient_id): Updates a specific patient.
-        delete_patient(patient_id): Deletes a specific patient.
+        delete_patient(patient_id): Moves a specific patient to the archive.
+        snapshot_request(): Checks whether the snapshot covers the current request.
+        snapshot_response(view): Serves the patient list from the snapshot.
+        start_snapshot(): Starts keeping the patient list precomputed.
+        start_archiver(): Starts archiving discharged patients in the background.
         run(): Runs the Flask application.
     """
 
-    def __init__(self):
+    def __init__(self, writer_url=None, trusted_addresses=TRUSTED_CLIENT_ADDRESSES):
+        # pylint: disable=import-outside-toplevel
+        from patient_db import PatientDB
+        from patient_validator import PatientValidator
+        from doctor_api import DoctorAPIController
+
         self.app = Flask(__name__)
         self.patient_db = PatientDB()
+        self.validator = PatientValidator()
+        self.trusted_addresses = frozenset(trusted_addresses)
+        self.write_router = WriteRouter(self.app, self.client_id, writer_url)
+        self.rate_limiter = admission.RateLimiter() if RATE_LIMITING_ENABLED else None
+        self.admission = admission.AdmissionController()
+        self.app.before_request(self.admit_request)
+        self.app.teardown_request(self.release_request)
+        self.snapshot = None
+        self.profiler = None
+        if PROFILING_ADMIN_TOKEN:
+            from profiling import RequestProfiler, ProfileAPIController
+
+            self.profiler = RequestProfiler(
+                self.app.wsgi_app, PROFILING_ADMIN_TOKEN, PROFILE_ALL_REQUESTS
+            )
+            self.app.wsgi_app = self.profiler
+            ProfileAPIController(self.app, self.profiler)
         self.setup_routes()
-        self.run()
+        self.doctors = DoctorAPIController(self.app, self.write_router)
 
     def setup_routes(self):
         """
-        Sets up the routes for the API endpoints.
+        Sets up the routes for the patient endpoints. The doctor and profile
+        endpoints are set up by their own controllers.
         """
         self.app.route("/patients", methods=["GET"])(self.get_patients)
         self.app.route("/patients/<patient_id>", methods=["GET"])(self.get_patient)
-        self.app.route("/patients", methods=["POST"])(self.create_patient)
-        self.app.route("/patient/<patient_id>", methods=["PUT"])(self.update_patient)
-        self.app.route("/patient/<patient_id>", methods=["DELETE"])(self.delete_patient)
+        self.write_router.route("/patients", "POST", self.create_patient)
+        self.write_router.route("/patient/<patient_id>", "PUT", self.update_patient)
+        self.write_router.route("/patient/<patient_id>", "DELETE", self.delete_patient)
+
+    def client_id(self):
+        """
+        Identifies the client of the current request. The X-Client-Id header is
+        only used when the request comes from a trusted address, such as the
+        front-end or a read worker forwarding a write; otherwise a client could
+        escape its rate limit by sending a new identifier with every request.
+
+        Returns:
+            str: The client identifier.
+        """
+        if request.remote_addr in self.trusted_addresses:
+            return request.headers.get(admission.CLIENT_ID_HEADER) or request.remote_addr
+        return request.remote_addr
+
+    def route_cost(self):
+        """
+        Classifies the current request by how much work it causes. Listing or
+        searching every patient scans the whole table, so it is expensive.
+
+        Returns:
+            str: The cost class of the request.
+        """
+        if request.method != "GET":
+            return admission.WRITE
+        if request.endpoint == "get_patients" and not self.snapshot_request():
+            return admission.EXPENSIVE
+        return admission.CHEAP
+
+    def snapshot_request(self):
+        """
+        Checks whether the current patient list request can be answered from
+        the precomputed snapshot.
+
+        Returns:
+            bool: True if the snapshot covers the request, False otherwise.
+        """
+        return (
+            self.snapshot is not None
+            and self.snapshot.get() is not None
+            and "search_name" not in request.args
+            and not self.include_archived()
+        )
+
+    def snapshot_response(self, view):
+        """
+        Builds the response of the patient list from the precomputed snapshot,
+        compressed when the client accepts gzip.
+
+        Args:
+            view (tuple): The JSON bytes and gzip bytes of the list.
+
+        Returns:
+            Response: The list response.
+        """
+        body, compressed = view
+        if "gzip" in request.accept_encodings:
+            response = Response(compressed, 200, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(body, 200, mimetype="application/json")
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    def admit_request(self):
+        """
+        Rejects the current request if its client is over the rate limit of the
+        route, or if the concurrency budget of the route is used up.
+
+        Returns:
+            tuple: A 429 or 503 response with Retry-After, or None to proceed.
+        """
+        cost = self.route_cost()
+        wait = 0
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.acquire(self.client_id(), cost)
+        if wait:
+            return (
+                jsonify({"result": "failure", "reason": "Rate limit exceeded"}),
+                429,
+                {"Retry-After": str(wait)},
+            )
+        if not self.admission.admit(cost):
+            return (
+                jsonify({"result": "failure", "reason": "Server is busy"}),
+                503,
+                {"Retry-After": "1"},
+            )
+        g.admitted_cost = cost
+        return None
+
+    def release_request(self, _exception):
+        """
+        Gives back the concurrency slot of a finished request.
+
+        Args:
+            _exception (Exception): The error the request ended with, if any.
+        """
+        cost = g.pop("admitted_cost", None)
+        if cost is not None:
+            self.admission.release(cost)
 
     def validate_patient_request_body(self, request_body):
         """
@@ -51,14 +222,9 @@ class PatientAPIController:
             request_body (dict): The request body containing patient data.
 
         Returns:
-            bool: True if the request body is valid, False otherwise.
+            dict: Field name to error message, empty if the request body is valid.
         """
-        required_fields = PATIENT_COLUMN_NAMES
-        if not all(field in request_body for field in required_fields):
-            print("Validation failed: missing required fields")
-            return False
-        # I will add more validation here
-        return True
+        return self.validator.validate_create(request_body)
 
     def row_to_dict(self, row_values):
         """
@@ -74,43 +240,99 @@ class PatientAPIController:
 
     def create_patient(self):
         """
-        Creates a new patient.
+        Creates a new patient. A JSON array in the body creates every patient
+        in it within a single transaction.
 
         Returns:
             tuple: A tuple containing the response data and status code.
         """
-        request_body = request.get_json()
-        if not self.validate_patient_request_body(request_body):
-            return jsonify({"result": "failure", "reason": "Invalid patient data"}), 400
+        request_body = request.get_json(silent=True)
+        if isinstance(request_body, list):
+            return self.create_patients(request_body)
+        errors = self.validate_patient_request_body(request_body)
+        if errors:
+            return invalid_request("Invalid patient data", errors)
         result = self.patient_db.insert_patient(request_body)
         if result is None:
-            return (
-                jsonify(
-                    {"result": "failure", "reason": "Failed to insert the database"}
-                ),
-                400,
-            )
+            return database_failure("insert")
+        if not result:
+            return self.patient_exists()
         return jsonify({PATIENT_ID_COLUMN: result[0]}), 201
 
+    def patient_exists(self):
+        """
+        Builds the response for an insert conflicting with an existing patient.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        return (
+            jsonify(
+                {
+                    "result": "failure",
+                    "reason": "Patient already exists",
+                    idempotency.CONFLICT_FIELD: idempotency.CONFLICT_EXISTS,
+                }
+            ),
+            409,
+        )
+
+    def create_patients(self, request_body):
+        """
+        Creates several patients at once.
+
+        Args:
+            request_body (list): The list of patient payloads.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        errors = self.validator.validate_bulk(request_body)
+        if errors:
+            return invalid_request("Invalid patient data", errors)
+        result = self.patient_db.insert_patients(request_body)
+        if result is None:
+            return database_failure("insert")
+        if result == 0:
+            return self.patient_exists()
+        patient_ids = [patient[PATIENT_ID_COLUMN] for patient in request_body]
+        return jsonify({PATIENT_ID_COLUMN: patient_ids}), 201
+
+    def include_archived(self):
+        """
+        Reads the include_archived query flag of the current request.
+
+        Returns:
+            bool: True if archived patients should be included, False otherwise.
+        """
+        flag = request.args.get("include_archived", "false")
+        return flag.lower() in ("1", "true", "yes")
+
     def get_patients(self):
         """
-        Retrieves all patients.
+        Retrieves all active patients, or all patients with include_archived.
+        The ward query parameter restricts the list to one ward. Plain lists are
+        served from the precomputed snapshot while it is fresh enough.
 
         Returns:
             tuple: A tuple containing the response data and status code.
         """
+        ward = request.args.get("ward", type=int)
+        view = self.snapshot.get(ward) if self.snapshot_request() else None
+        if view is not None:
+            return self.snapshot_response(view)
         search_name = request.args.get('search_name')
+        include_archived = self.include_archived()
         if search_name is None:
-            result = self.patient_db.select_all_patients()
+            result = self.patient_db.select_all_patients(include_archived)
         else:
-            result = self.patient_db.fetch_patient_id_by_name(str(search_name))
-        if result is None:
-            return (
-                jsonify(
-                    {"result": "failure", "reason": "Failed to select the database"}
-                ),
-                400,
+            result = self.patient_db.fetch_patient_id_by_name(
+                str(search_name), include_archived
             )
+        if result is None:
+            return database_failure("select")
+        if ward is not None:
+            result = [patient for patient in result if patient[PATIENT_WARD_COLUMN] == ward]
         return jsonify(result), 200
 
     def get_patient(self, patient_id):
@@ -123,14 +345,11 @@ class PatientAPIController:
         Returns:
             tuple: A tuple containing the response data and status code.
         """
-        result = self.patient_db.select_patient(patient_id)
+        result = self.patient_db.select_patient(patient_id, self.include_archived())
         if result is None:
-            return (
-                jsonify(
-                    {"result": "failure", "reason": "Failed to select the database"}
-                ),
-                400,
-            )
+            return database_failure("select")
+        if not result:
+            return jsonify({"result": "failure", "reason": "Patient not found"}), 404
         return jsonify(result), 200
 
     def update_patient(self, patient_id):
@@ -143,20 +362,21 @@ class PatientAPIController:
         Returns:
             tuple: A tuple containing the response data and status code.
         """
-        update_dict = request.get_json()
+        update_dict = request.get_json(silent=True)
+        errors = self.validator.validate_update(patient_id, update_dict)
+        if errors:
+            return invalid_request("Invalid patient data", errors)
         result = self.patient_db.update_patient(patient_id, update_dict)
         if result is None:
-            return (
-                jsonify(
-                    {"result": "failure", "reason": "Failed to update the database"}
-                ),
-                400,
-            )
+            return database_failure("update")
+        if result == 0:
+            return jsonify({"result": "failure", "reason": "Patient not found"}), 404
         return jsonify({"result": "success updating"}), 200
 
     def delete_patient(self, patient_id):
         """
-        Deletes a specific patient.
+        Deletes a specific patient. The record is moved to the archive and can
+        still be read with include_archived.
 
         Args:
             patient_id (str): The ID of the patient to delete.
@@ -166,14 +386,40 @@ class PatientAPIController:
         """
         result = self.patient_db.delete_patient(patient_id)
         if result is None:
-            return (
-                jsonify(
-                    {"result": "failure", "reason": "Failed to delete the database"}
-                ),
-                400,
-            )
+            return database_failure("delete")
+        if result == 0:
+            return jsonify({"result": "failure", "reason": "Patient not found"}), 404
         return jsonify({"result": "success deleting"}), 200
 
+    def start_snapshot(self):
+        """
+        Starts keeping the patient list precomputed in a background thread.
+
+        Returns:
+            ListSnapshot: The started snapshot thread.
+        """
+        # pylint: disable=import-outside-toplevel
+        from list_snapshot import ListSnapshot
+
+        self.snapshot = ListSnapshot(self.patient_db)
+        self.snapshot.start()
+        return self.snapshot
+
+    def start_archiver(self):
+        """
+        Starts archiving discharged patients in a background thread. Only the
+        process performing writes should call this.
+
+        Returns:
+            PatientArchiver: The started archiver thread.
+        """
+        # pylint: disable=import-outside-toplevel
+        from patient_archiver import PatientArchiver
+
+        archiver = PatientArchiver(self.patient_db)
+        archiver.start()
+        return archiver
+
     def run(self):
         """
         Runs the Flask application.
@@ -181,4 +427,11 @@ class PatientAPIController:
         self.app.run()
 
 
-PatientAPIController()
+if __name__ == "__main__":
+    from patient_db_config import init_schema
+
+    init_schema()
+    controller = PatientAPIController()
+    controller.start_archiver()
+    controller.start_snapshot()
+    controller.run()
@@ -0,0 +1,226 @@
+"""
+Routing helpers shared by the API controllers: write routes with
+Idempotency-Key replay or forwarding to the writer process, and the common
+request parsing and error responses.
+"""
+
+import functools
+import hashlib
+from flask import request, jsonify
+from config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+import idempotency
+import admission
+
+
+def invalid_request(reason, errors):
+    """
+    Builds the response for a request that failed validation.
+
+    Args:
+        reason (str): What was invalid, e.g. "Invalid patient data".
+        errors (dict): Field name to error message.
+
+    Returns:
+        tuple: A tuple containing the response data and status code.
+    """
+    return jsonify({"result": "failure", "reason": reason, "errors": errors}), 400
+
+
+def database_failure(operation):
+    """
+    Builds the response for a request whose database operation failed.
+
+    Args:
+        operation (str): The failed operation, e.g. "select".
+
+    Returns:
+        tuple: A tuple containing the response data and status code.
+    """
+    return (
+        jsonify({"result": "failure", "reason": f"Failed to {operation} the database"}),
+        400,
+    )
+
+
+def page_limit():
+    """
+    Reads the limit query parameter of a paginated request.
+
+    Returns:
+        int: The page size, or None if it is not between 1 and MAX_PAGE_SIZE.
+    """
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or not 1 <= limit <= MAX_PAGE_SIZE:
+        return None
+    return limit
+
+
+class WriteRouter:
+    """
+    Registers the routes that modify the database.
+
+    In the process performing writes, a write view is wrapped so that a
+    request repeating the Idempotency-Key of an earlier one gets the earlier
+    response back. In a read worker, the route forwards the request to the
+    writer process instead, so that all writes go through a single connection.
+
+    Attributes:
+        app (Flask): The Flask application instance.
+        client_id (function): Identifies the client of the current request.
+        writer_url (str): URL of the writer process that write requests are
+        forwarded to, or None when this process performs writes itself.
+        idempotency_store (IdempotencyStore): Responses to recent writes sent
+        with an Idempotency-Key header.
+
+    Methods:
+        route(rule, method, view): Registers a route that modifies the database.
+        idempotent(view): Wraps a write view so retries with the same
+        Idempotency-Key replay the stored response.
+        forwarded_headers(): Selects the request headers forwarded to the writer.
+        forward_write(**_kwargs): Forwards the current request to the writer process.
+    """
+
+    def __init__(self, app, client_id, writer_url=None):
+        self.app = app
+        self.client_id = client_id
+        self.writer_url = writer_url
+        self.idempotency_store = idempotency.IdempotencyStore()
+
+    def route(self, rule, method, view):
+        """
+        Registers a route that modifies the database.
+
+        Args:
+            rule (str): The URL rule.
+            method (str): The HTTP method.
+            view (function): The view performing the write.
+        """
+        endpoint = view.__name__
+        if self.writer_url is not None:
+            view = self.forward_write
+        else:
+            view = self.idempotent(view)
+        self.app.add_url_rule(rule, endpoint, view, methods=[method])
+
+    def idempotent(self, view):
+        """
+        Wraps a write view so that a request repeating the Idempotency-Key of
+        an earlier one gets the earlier response back without running the view.
+        Keys are scoped by client, so clients picking the same key never see
+        each other's responses. Server errors are not stored, so that a retry
+        can succeed. A retry arriving while the first attempt is still running
+        gets 409 with Retry-After.
+
+        Args:
+            view (function): The view performing the write.
+
+        Returns:
+            function: The wrapped view.
+        """
+
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            key = request.headers.get(idempotency.IDEMPOTENCY_KEY_HEADER)
+            if key is None:
+                return view(**kwargs)
+            key = (self.client_id(), key)
+            fingerprint = (
+                request.method,
+                request.path,
+                hashlib.sha256(request.get_data()).hexdigest(),
+            )
+            state, stored = self.idempotency_store.begin(key, fingerprint)
+            if state == idempotency.REPLAY:
+                body, status, content_type = stored
+                return (
+                    body,
+                    status,
+                    {
+                        "Content-Type": content_type,
+                        idempotency.IDEMPOTENT_REPLAY_HEADER: "true",
+                    },
+                )
+            if state == idempotency.IN_PROGRESS:
+                return (
+                    jsonify(
+                        {
+                            "result": "failure",
+                            "reason": "Request is already in progress",
+                            idempotency.CONFLICT_FIELD: idempotency.CONFLICT_IN_PROGRESS,
+                        }
+                    ),
+                    409,
+                    {"Retry-After": "1"},
+                )
+            if state == idempotency.MISMATCH:
+                return (
+                    jsonify(
+                        {
+                            "result": "failure",
+                            "reason": "Idempotency-Key was used for a different request",
+                        }
+                    ),
+                    422,
+                )
+            try:
+                response = self.app.make_response(view(**kwargs))
+            except Exception:
+                self.idempotency_store.abandon(key)
+                raise
+            if response.status_code >= 500:
+                self.idempotency_store.abandon(key)
+            else:
+                self.idempotency_store.complete(
+                    key, (response.get_data(), response.status_code, response.content_type)
+                )
+            return response
+
+        return wrapper
+
+    def forwarded_headers(self):
+        """
+        Selects the headers of the current request that the writer needs.
+
+        Returns:
+            dict: The headers to forward.
+        """
+        headers = {
+            "Content-Type": request.content_type or "application/json",
+            admission.CLIENT_ID_HEADER: self.client_id(),
+        }
+        key = request.headers.get(idempotency.IDEMPOTENCY_KEY_HEADER)
+        if key is not None:
+            headers[idempotency.IDEMPOTENCY_KEY_HEADER] = key
+        return headers
+
+    def forward_write(self, **_kwargs):
+        """
+        Forwards the current request to the writer process.
+
+        Returns:
+            tuple: The writer's response body, status code and headers.
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        try:
+            response = requests.request(
+                request.method,
+                self.writer_url + request.full_path,
+                data=request.get_data(),
+                headers=self.forwarded_headers(),
+                timeout=5,
+            )
+        except requests.RequestException as e:
+            print("Error occurred while forwarding the write", e)
+            return (
+                jsonify({"result": "failure", "reason": "Writer is unavailable"}),
+                503,
+            )
+        headers = {
+            "Content-Type": response.headers.get("Content-Type", "application/json")
+        }
+        if "Retry-After" in response.headers:
+            headers["Retry-After"] = response.headers["Retry-After"]
+        if idempotency.IDEMPOTENT_REPLAY_HEADER in response.headers:
+            headers[idempotency.IDEMPOTENT_REPLAY_HEADER] = "true"
+        return response.content, response.status_code, headers
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of the per-call statement overhead in PatientDB.
+
+Compares building a new SQLAlchemy statement on every call, as PatientDB
+used to, against executing the statements PatientDB builds once. Both run
+on the same connection to an in-memory SQLite database so that the numbers
+show statement construction and compilation rather than disk I/O.
+
+Usage:
+    python src/benchmark_patient_db.py [calls]
+"""
+
+import sys
+import timeit
+from sqlalchemy import create_engine, select
+from patient_db import PatientDB, PATIENT_ID_PARAM, PATIENT_NAME_PATTERN_PARAM
+from patient_db import UPDATE_VALUE_PARAM_PREFIX
+from patient_db_config import METADATA, PATIENTS_TABLE
+
+PATIENT_ID = "30ed4a02-40e0-40a5-a939-e7f38a81acac"
+PATIENT = {
+    "patient_id": PATIENT_ID,
+    "patient_name": "test-patient",
+    "patient_age": 23,
+    "patient_gender": "Male",
+    "patient_checkin": "2024-03-23 21:32:07.071378",
+    "patient_checkout": "None",
+    "patient_ward": 1,
+    "patient_room": 15,
+}
+UPDATE = {"patient_name": "test-patient_2", "patient_ward": 3, "patient_room": 35}
+
+
+def rebuilt_calls(conn):
+    """
+    Returns the benchmarked operations building their statement on every call.
+
+    Args:
+        conn (Connection): The connection to execute on.
+
+    Returns:
+        dict: Operation name to a function running it once.
+    """
+    return {
+        "select_patient": lambda: conn.execute(
+            PATIENTS_TABLE.select().where(PATIENTS_TABLE.c.patient_id == PATIENT_ID)
+        ).fetchone(),
+        "search_name": lambda: conn.execute(
+            PATIENTS_TABLE.select().where(
+                PATIENTS_TABLE.c.patient_name.like("%test%")
+            )
+        ).fetchall(),
+        "select_all": lambda: conn.execute(select(PATIENTS_TABLE)).fetchall(),
+        "update_patient": lambda: conn.execute(
+            PATIENTS_TABLE.update()
+            .where(PATIENTS_TABLE.c.patient_id == PATIENT_ID)
+            .values(**UPDATE)
+        ),
+    }
+
+
+def cached_calls(conn, patient_db):
+    """
+    Returns the benchmarked operations using the statements cached in PatientDB.
+
+    Args:
+        conn (Connection): The connection to execute on.
+        patient_db (PatientDB): The instance holding the cached statements.
+
+    Returns:
+        dict: Operation name to a function running it once.
+    """
+    update_params = {UPDATE_VALUE_PARAM_PREFIX + k: v for k, v in UPDATE.items()}
+    update_params[PATIENT_ID_PARAM] = PATIENT_ID
+    return {
+        "select_patient": lambda: conn.execute(
+            patient_db.select_by_id_stmt, {PATIENT_ID_PARAM: PATIENT_ID}
+        ).fetchone(),
+        "search_name": lambda: conn.execute(
+            patient_db.select_by_name_stmt, {PATIENT_NAME_PATTERN_PARAM: "%test%"}
+        ).fetchall(),
+        "select_all": lambda: conn.execute(patient_db.select_all_stmt).fetchall(),
+        "update_patient": lambda: conn.execute(
+            patient_db.update_stmt_for(UPDATE), update_params
+        ),
+    }
+
+
+def main(calls):
+    """
+    Runs every operation with both approaches and prints the per-call time.
+
+    Args:
+        calls (int): The number of calls per operation.
+    """
+    engine = create_engine("sqlite://")
+    METADATA.create_all(engine)
+    with engine.connect() as conn:
+        conn.execute(PATIENTS_TABLE.insert(), PATIENT)
+        before = rebuilt_calls(conn)
+        after = cached_calls(conn, PatientDB())
+        print(f"{'operation':<16}{'rebuilt (us)':>14}{'cached (us)':>14}{'speedup':>10}")
+        for name, rebuilt in before.items():
+            rebuilt_us = timeit.timeit(rebuilt, number=calls) / calls * 1e6
+            cached_us = timeit.timeit(after[name], number=calls) / calls * 1e6
+            print(
+                f"{name:<16}{rebuilt_us:>14.1f}{cached_us:>14.1f}"
+                f"{rebuilt_us / cached_us:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,153 @@
+"""
+Benchmark of read throughput against the number of deploy.py read workers.
+
+For each worker count a fresh deployment is started on a temporary database,
+seeded through the writer with a bulk insert, and then loaded with point
+lookups from several client processes for a fixed duration.
+
+Usage:
+    python src/benchmark_read_scaling.py [--workers 1 2 4] [--clients 8] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from deploy import wait_for_port
+
+HOST = "127.0.0.1"
+PORT = 5100
+WRITER_PORT = 5101
+BASE_URL = f"http://{HOST}:{PORT}"
+
+
+def seed_patients(count):
+    """
+    Inserts patients through the public port and returns their IDs.
+
+    Args:
+        count (int): The number of patients to insert.
+
+    Returns:
+        list: The IDs of the inserted patients.
+    """
+    patients = [
+        {
+            "patient_id": f"bench-{index}",
+            "patient_name": f"patient {index}",
+            "patient_age": index % 100,
+            "patient_gender": "Male" if index % 2 else "Female",
+            "patient_checkin": "2024-03-23 21:32:07.071378",
+            "patient_checkout": None,
+            "patient_ward": 1,
+            "patient_room": 10 + index % 10,
+        }
+        for index in range(count)
+    ]
+    response = requests.post(BASE_URL + "/patients", json=patients, timeout=30)
+    response.raise_for_status()
+    return [patient["patient_id"] for patient in patients]
+
+
+def client(patient_ids, seconds, results):
+    """
+    Issues point lookups in a loop and records how many succeeded.
+
+    Args:
+        patient_ids (list): The IDs to look up in turn.
+        seconds (float): How long to run.
+        results (Queue): Where to put the number of completed requests.
+    """
+    session = requests.Session()
+    completed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        patient_id = patient_ids[completed % len(patient_ids)]
+        url = f"{BASE_URL}/patients/{patient_id}"
+        if session.get(url, timeout=5).ok:
+            completed += 1
+    results.put(completed)
+
+
+def measure(workers, clients, seconds, db_path):
+    """
+    Starts a deployment with the given number of workers and measures reads.
+
+    Args:
+        workers (int): The number of read workers.
+        clients (int): The number of client processes.
+        seconds (float): How long each client runs.
+        db_path (str): Path to the temporary database file.
+
+    Returns:
+        float: Completed requests per second.
+    """
+    with subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "deploy.py"),
+            "--workers", str(workers),
+            "--port", str(PORT),
+            "--writer-port", str(WRITER_PORT),
+            "--db", db_path,
+        ],
+        # Every client runs on this host, so the per-client rate limit would cap
+        # the measured throughput; the concurrency limits still apply.
+        env={**os.environ, "PATIENT_DB_ECHO": "0", "PATIENT_RATE_LIMITING": "0"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    ) as server:
+        try:
+            wait_for_port(HOST, PORT)
+            patient_ids = seed_patients(1000)
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=client, args=(patient_ids, seconds, results))
+                for _ in range(clients)
+            ]
+            for process in processes:
+                process.start()
+            total = sum(results.get() for _ in processes)
+            for process in processes:
+                process.join()
+            return total / seconds
+        finally:
+            server.terminate()
+
+
+def main():
+    """
+    Runs the benchmark for every worker count and prints the throughput.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"{cores} CPU cores")
+    if cores < 2 * max(args.workers):
+        # The workers and the clients share the cores of this host, so with
+        # fewer cores the throughput cannot scale with the worker count.
+        print(
+            f"Warning: {max(args.workers)} workers and their clients need at least "
+            f"{2 * max(args.workers)} cores to show scaling"
+        )
+    print(f"{'workers':>8}{'req/s':>12}{'scaling':>10}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            rate = measure(
+                workers, args.clients, args.seconds, os.path.join(tmp, "patient.db")
+            )
+        baseline = baseline or rate
+        print(f"{workers:>8}{rate:>12.0f}{rate / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the list, search and update paths of PatientDB on a large table.
+
+Builds a database of synthetic patients with generate_patients.py, or reuses
+one built earlier, and times the operations the API runs through PatientDB.
+A database is cached per row count and seed, so the million-row fixture is
+only generated once.
+
+Usage:
+    python src/benchmark_scale.py [--count 1000000] [--seed 1] [--dir /tmp] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from generate_patients import build_database
+
+
+def scale_database(directory, count, seed):
+    """
+    Returns the path of a generated database, building it if it is missing.
+
+    Args:
+        directory (str): Where the generated databases are kept.
+        count (int): The number of patients.
+        seed (int): The random seed.
+
+    Returns:
+        str: Path to the database file.
+    """
+    db_path = os.path.join(directory, f"patients-{count}-{seed}.db")
+    if not os.path.exists(db_path):
+        started = time.perf_counter()
+        build_database(db_path, count, seed)
+        print(f"Generated {db_path} in {time.perf_counter() - started:.1f}s")
+    else:
+        os.environ["PATIENT_DB_PATH"] = db_path
+        os.environ.setdefault("PATIENT_DB_ECHO", "0")
+    return db_path
+
+
+def timed(operation, runs):
+    """
+    Runs an operation several times.
+
+    Args:
+        operation (function): The operation to run.
+        runs (int): The number of runs.
+
+    Returns:
+        tuple: The median and the worst time in milliseconds.
+    """
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        operation()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), max(times)
+
+
+def sample_fixture(db_path):
+    """
+    Picks the patients, name and doctor the operations are run with.
+
+    Args:
+        db_path (str): Path to the database file.
+
+    Returns:
+        tuple: A list of random patient IDs, a patient name and a doctor ID.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        patient_ids = [row[0] for row in conn.execute(
+            "SELECT patient_id FROM patients ORDER BY random() LIMIT 1000"
+        )]
+        patient_name = conn.execute("SELECT patient_name FROM patients LIMIT 1").fetchone()[0]
+        doctor_id = conn.execute("SELECT doctor_id FROM doctors LIMIT 1").fetchone()[0]
+    finally:
+        conn.close()
+    return patient_ids, patient_name, doctor_id
+
+
+def scale_operations(db_path, seed):
+    """
+    Builds the operations to time against the fixture.
+
+    Args:
+        db_path (str): Path to the database file.
+        seed (int): The random seed for picking patients.
+
+    Returns:
+        dict: Operation name to a function running the operation once.
+    """
+    # pylint: disable=import-outside-toplevel
+    from patient_db import PatientDB
+    from doctor_db import DoctorDB
+
+    patient_ids, patient_name, doctor_id = sample_fixture(db_path)
+    rng = random.Random(seed)
+    patient_db = PatientDB()
+    doctor_db = DoctorDB()
+    return {
+        "select_all_patients": patient_db.select_all_patients,
+        "search_name": lambda: patient_db.fetch_patient_id_by_name(patient_name),
+        "select_patient": lambda: patient_db.select_patient(rng.choice(patient_ids)),
+        "update_patient": lambda: patient_db.update_patient(
+            rng.choice(patient_ids), {"patient_age": rng.randrange(100)}
+        ),
+        "doctor_patients_page": lambda: doctor_db.select_doctor_patients(doctor_id, "", 50),
+    }
+
+
+def main():
+    """
+    Builds or reuses the fixture and prints the timing of every operation.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = scale_database(args.dir, args.count, args.seed)
+    operations = scale_operations(db_path, args.seed)
+
+    print(f"{'operation':<24}{'median ms':>12}{'max ms':>12}")
+    for name, operation in operations.items():
+        median, worst = timed(operation, args.runs)
+        print(f"{name:<24}{median:>12.2f}{worst:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
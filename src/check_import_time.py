@@ -0,0 +1,92 @@
+"""
+Cold-start check for the application modules.
+
+Imports each module in a fresh interpreter with ``python -X importtime``,
+from an empty working directory, and fails when the cumulative import time
+exceeds its budget or when the import leaves files behind (for example a
+database created as a side effect).
+
+Usage:
+    python src/check_import_time.py [--runs 3] [--scale 1.0]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time budgets in milliseconds.
+IMPORT_BUDGETS_MS = {
+    "config": 5,
+    "patient_columns": 5,
+    "patient": 20,
+    "api_controller": 250,
+    "patient_db": 400,
+}
+
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter and an empty directory.
+
+    Args:
+        module (str): The name of the module to import.
+
+    Returns:
+        tuple: The cumulative import time in ms and the files left behind.
+    """
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd,
+            env={**os.environ, "PYTHONPATH": SRC_DIR},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        leftovers = os.listdir(cwd)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.strip() == module and not name.startswith("  "):
+            return int(cumulative_us) / 1000, leftovers
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    """
+    Checks every module against its budget and exits non-zero on failure.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplier for every budget"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<18}{'import (ms)':>12}{'budget (ms)':>12}  result")
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        runs = [measure_import(module) for _ in range(args.runs)]
+        elapsed = min(elapsed for elapsed, _ in runs)
+        leftovers = sorted({name for _, names in runs for name in names})
+        budget *= args.scale
+        problems = []
+        if elapsed > budget:
+            problems.append("over budget")
+        if leftovers:
+            problems.append("created " + ", ".join(leftovers))
+        failed = failed or bool(problems)
+        print(
+            f"{module:<18}{elapsed:>12.1f}{budget:>12.1f}  "
+            f"{'; '.join(problems) or 'ok'}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
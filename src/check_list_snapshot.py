@@ -0,0 +1,199 @@
+"""
+Consistency check for the precomputed patient list snapshot.
+
+Builds a temporary database, runs random inserts, updates, ward moves and
+deletes against it, and after every round compares the bytes the snapshot
+serves for every list with the bytes the database path of GET /patients
+returns, and the gzip form with its decompressed JSON. Small chunks are used
+so that chunks are split, emptied and reused along the way.
+
+Usage:
+    python src/check_list_snapshot.py [--rounds 50] [--seed 1]
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+
+CHUNK_ROWS = 4
+OPERATIONS_PER_ROUND = 20
+
+
+def compare_lists(controller, snapshot, wards):
+    """
+    Compares every list served from the snapshot with the database path.
+
+    Args:
+        controller (PatientAPIController): The controller to request lists from.
+        snapshot (ListSnapshot): The refreshed snapshot.
+        wards (list): The wards to compare the lists of, besides every ward.
+
+    Returns:
+        list: A description of every mismatch.
+    """
+    client = controller.app.test_client()
+    problems = []
+    for query in [""] + [f"?ward={ward}" for ward in wards]:
+        controller.snapshot = None
+        expected = client.get("/patients" + query).data
+        controller.snapshot = snapshot
+        plain = client.get("/patients" + query)
+        compressed = client.get("/patients" + query, headers={"Accept-Encoding": "gzip"})
+        if compressed.headers.get("Content-Encoding") != "gzip":
+            problems.append(f"/patients{query}: not served from the snapshot")
+        else:
+            try:
+                if gzip.decompress(compressed.data) != plain.data:
+                    problems.append(f"/patients{query}: gzip body differs from the JSON body")
+            except (OSError, EOFError, zlib.error) as e:
+                problems.append(f"/patients{query}: invalid gzip body ({e})")
+        if plain.data != expected:
+            problems.append(f"/patients{query}: snapshot differs from the database")
+    return problems
+
+
+def random_patient(rng, wards, rooms, number):
+    """
+    Builds a valid patient record.
+
+    Args:
+        rng (Random): The random generator.
+        wards (list): The wards to choose from.
+        rooms (dict): Ward to its room numbers.
+        number (int): A number making the patient ID unique.
+
+    Returns:
+        dict: The patient record.
+    """
+    ward = rng.choice(wards)
+    return {
+        "patient_id": f"check-{number}",
+        "patient_name": f"Patient {number}",
+        "patient_age": rng.randrange(100),
+        "patient_gender": rng.choice(["Male", "Female"]),
+        "patient_checkin": "2024-03-23 21:32:07",
+        "patient_checkout": "None",
+        "patient_ward": ward,
+        "patient_room": int(rng.choice(rooms[ward])),
+    }
+
+
+def run_round(patient_db, rng, active, counter):
+    """
+    Runs one round of random writes.
+
+    Args:
+        patient_db (PatientDB): The patient database instance.
+        rng (Random): The random generator.
+        active (list): The IDs of the active patients, updated in place.
+        counter (list): The next patient number, updated in place.
+    """
+    # pylint: disable=import-outside-toplevel
+    from config import WARD_NUMBERS, ROOM_NUMBERS
+
+    for _ in range(OPERATIONS_PER_ROUND):
+        operation = rng.random()
+        if operation < 0.5 or not active:
+            patient = random_patient(rng, WARD_NUMBERS, ROOM_NUMBERS, counter[0])
+            counter[0] += 1
+            patient_db.insert_patient(patient)
+            active.append(patient["patient_id"])
+        elif operation < 0.8:
+            moved = random_patient(rng, WARD_NUMBERS, ROOM_NUMBERS, 0)
+            patient_db.update_patient(
+                rng.choice(active),
+                {key: moved[key] for key in ("patient_age", "patient_ward", "patient_room")},
+            )
+        else:
+            # Deleting the newest patient frees its rowid for the next insert.
+            patient_id = active.pop(-1 if rng.random() < 0.5 else rng.randrange(len(active)))
+            patient_db.delete_patient(patient_id)
+
+
+def add_legacy_patient(db_path):
+    """
+    Inserts a patient from before wards were validated, without a ward.
+
+    Args:
+        db_path (str): Path to the database file.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO patients VALUES "
+            "('legacy', 'Legacy Patient', 40, 'Male', '2024-03-23 21:32:07', 'None', NULL, NULL)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_rounds(rounds, seed):
+    """
+    Runs the rounds of random writes against the configured database and
+    compares the lists after every round.
+
+    Args:
+        rounds (int): The number of rounds.
+        seed (int): The random seed.
+
+    Returns:
+        str: A description of the first failed round, or None if every round passed.
+    """
+    # pylint: disable=import-outside-toplevel
+    from api_controller import PatientAPIController
+    from list_snapshot import ListSnapshot
+    from config import WARD_NUMBERS
+
+    controller = PatientAPIController()
+    snapshot = ListSnapshot(controller.patient_db, chunk_rows=CHUNK_ROWS)
+    rng = random.Random(seed)
+    active = []
+    counter = [1]
+    wards = WARD_NUMBERS + [max(WARD_NUMBERS) + 1]
+    for round_number in range(rounds):
+        if round_number:
+            run_round(controller.patient_db, rng, active, counter)
+        if not snapshot.refresh():
+            return f"round {round_number}: the snapshot could not be refreshed"
+        snapshot.checked_at = time.monotonic()
+        problems = compare_lists(controller, snapshot, wards)
+        if problems:
+            return f"round {round_number}: " + "; ".join(problems)
+    print(f"{rounds} rounds, {len(active) + 1} active patients: ok")
+    return None
+
+
+def main():
+    """
+    Runs the check and exits non-zero on the first mismatch.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "patients.db")
+        os.environ["PATIENT_DB_PATH"] = db_path
+        os.environ["PATIENT_DB_ECHO"] = "0"
+        os.environ["PATIENT_RATE_LIMITING"] = "0"
+        # pylint: disable=import-outside-toplevel
+        from patient_db_config import init_schema
+
+        init_schema()
+        add_legacy_patient(db_path)
+        failure = check_rounds(args.rounds, args.seed)
+    if failure:
+        print(failure)
+    sys.exit(1 if failure else 0)
+
+
+if __name__ == "__main__":
+    main()
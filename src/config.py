@@ -1,7 +1,42 @@
 """Common configuration variables for the application."""
 
+import os
+
 DOCTORS = ["Csaba", "Gabor", "Szabolcs", "Sumair", "Mehdi", "Ali"]
 GENDERS = ["Male", "Female"]
 WARD_NUMBERS = [1, 2, 3, 4]
+PATIENT_AGE_RANGE = (0, 150)
 ROOM_NUMBERS = {ward: [f"{ward}{room}" for room in range(10)] for ward in WARD_NUMBERS}
 API_CONTROLLER_URL = "http://127.0.0.1:5000"
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_INTERVAL_SECONDS = 3600
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+IDEMPOTENCY_TTL_SECONDS = 600
+IDEMPOTENCY_MAX_KEYS = 10000
+# Requests per second and burst allowed per client for each route cost class.
+RATE_LIMITS = {"cheap": (50, 100), "expensive": (2, 10), "write": (10, 20)}
+# Requests of each route cost class allowed to run at the same time per process.
+CONCURRENCY_LIMITS = {"cheap": 32, "expensive": 2, "write": 8}
+RATE_LIMIT_MAX_CLIENTS = 10000
+RATE_LIMITING_ENABLED = os.environ.get("PATIENT_RATE_LIMITING", "1") == "1"
+# Addresses allowed to name the client in the X-Client-Id header, such as the
+# Streamlit front-end or a reverse proxy, separated by commas. Other requests
+# are identified by their own address.
+TRUSTED_CLIENT_ADDRESSES = frozenset(
+    address.strip()
+    for address in os.environ.get("PATIENT_TRUSTED_CLIENT_ADDRESSES", "").split(",")
+    if address.strip()
+)
+# Per-request profiling is only available when an admin token is configured.
+PROFILING_ADMIN_TOKEN = os.environ.get("PATIENT_PROFILING_TOKEN")
+PROFILE_ALL_REQUESTS = os.environ.get("PATIENT_PROFILE_ALL", "0") == "1"
+PROFILE_TOP_N = 30
+PROFILE_BUFFER_SIZE = 20
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.001
+SNAPSHOT_MAX_STALENESS_MS = 500
+SNAPSHOT_COMPRESS_LEVEL = 6
+SNAPSHOT_CHUNK_ROWS = 1000
+# Changes older than this are pruned from the patient change log by the archiver.
+CHANGE_LOG_RETENTION_SECONDS = 3600
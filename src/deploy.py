@@ -0,0 +1,151 @@
+"""
+Multi-process deployment of the patient API.
+
+One writer process owns the only read-write connection to the SQLite file.
+N read workers share the public listening socket and answer GET requests
+from their own read-only connections, while forwarding every write to the
+writer. With write-ahead logging enabled by the writer, readers see committed
+data without ever blocking on it.
+
+Usage:
+    python src/deploy.py --workers 4 --port 5000 --writer-port 5001 --db patient.db
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+
+def serve_writer(host, port):
+    """
+    Runs the writer process serving every route on its own port, and the
+    background archiver. Public list requests only reach the read workers, so
+    the writer keeps no list snapshot.
+
+    Args:
+        host (str): The interface to bind.
+        port (int): The port to bind.
+    """
+    # pylint: disable=import-outside-toplevel
+    from werkzeug.serving import make_server
+    from api_controller import PatientAPIController
+    from patient_db_config import init_schema
+    from config import TRUSTED_CLIENT_ADDRESSES
+
+    init_schema()
+    # The read workers forward writes from this host, naming the client they
+    # identified in the X-Client-Id header.
+    controller = PatientAPIController(
+        trusted_addresses=TRUSTED_CLIENT_ADDRESSES | {"127.0.0.1", host}
+    )
+    controller.start_archiver()
+    make_server(host, port, controller.app, threaded=True).serve_forever()
+
+
+def serve_reader(host, port, listen_fd, writer_url):
+    """
+    Runs a read worker on the shared listening socket, with its own list
+    snapshot.
+
+    Args:
+        host (str): The interface the socket is bound to.
+        port (int): The port the socket is bound to.
+        listen_fd (int): The file descriptor of the shared listening socket.
+        writer_url (str): URL of the writer process.
+    """
+    # pylint: disable=import-outside-toplevel
+    from werkzeug.serving import make_server
+    from api_controller import PatientAPIController
+
+    controller = PatientAPIController(writer_url=writer_url)
+    controller.start_snapshot()
+    make_server(
+        host, port, controller.app, threaded=True, fd=listen_fd
+    ).serve_forever()
+
+
+def wait_for_port(host, port, timeout=10.0):
+    """
+    Blocks until a server accepts connections on the given port.
+
+    Args:
+        host (str): The host to connect to.
+        port (int): The port to connect to.
+        timeout (float): Seconds to wait before giving up.
+
+    Raises:
+        TimeoutError: If nothing accepts connections in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Nothing is listening on {host}:{port}")
+
+
+def deploy(workers, host, port, writer_port, db_path):
+    """
+    Starts the writer and the read workers and waits for them to exit.
+
+    Args:
+        workers (int): The number of read worker processes.
+        host (str): The interface to bind.
+        port (int): The public port shared by the read workers.
+        writer_port (int): The port of the writer process.
+        db_path (str): Path to the SQLite database file.
+    """
+    os.environ["PATIENT_DB_PATH"] = db_path
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    context = multiprocessing.get_context("fork")
+    writer_url = f"http://{host}:{writer_port}"
+
+    processes = [context.Process(target=serve_writer, args=(host, writer_port))]
+    processes[0].start()
+    wait_for_port(host, writer_port)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    for _ in range(workers):
+        process = context.Process(
+            target=serve_reader, args=(host, port, listener.fileno(), writer_url)
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        listener.close()
+
+
+def main():
+    """
+    Parses the command line and starts the deployment.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--writer-port", type=int, default=5001)
+    parser.add_argument(
+        "--db", default=os.environ.get("PATIENT_DB_PATH", "patient.db")
+    )
+    args = parser.parse_args()
+    deploy(args.workers, args.host, args.port, args.writer_port, args.db)
+
+
+if __name__ == "__main__":
+    main()
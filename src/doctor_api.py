@@ -0,0 +1,213 @@
+"""
+Doctor API Controller
+
+Serves the doctors and their patient assignments. Created by the patient API
+controller, on the same Flask application.
+"""
+
+from flask import request, jsonify
+from patient_columns import PATIENT_ID_COLUMN
+from patient_columns import DOCTOR_ID_COLUMN, DOCTOR_NAME_COLUMN
+from patient_columns import DOCTOR_PATIENT_COUNT_COLUMN
+from config import MAX_PAGE_SIZE
+from doctor_db import DoctorDB, ALREADY_ASSIGNED, NOT_FOUND
+from api_routing import invalid_request, database_failure, page_limit
+
+
+class DoctorAPIController:
+    """
+    This class represents the API controller for managing doctors and their
+    patient assignments.
+
+    Attributes:
+        app (Flask): The Flask application instance.
+        doctor_db (DoctorDB): The doctor database instance.
+        write_router (WriteRouter): Registers the routes that modify the database.
+
+    Methods:
+        setup_routes(): Sets up the routes for the doctor endpoints.
+        get_doctors(): Retrieves all doctors.
+        create_doctor(): Creates a new doctor.
+        get_doctor_patients(doctor_id): Retrieves a page of the patients of a doctor.
+        get_patient_doctors(patient_id): Retrieves a page of the doctors of a patient.
+        assign_patient(doctor_id): Assigns a patient to a doctor.
+        unassign_patient(doctor_id, patient_id): Removes a patient from a doctor.
+    """
+
+    def __init__(self, app, write_router):
+        self.app = app
+        self.doctor_db = DoctorDB()
+        self.write_router = write_router
+        self.setup_routes()
+
+    def setup_routes(self):
+        """
+        Sets up the routes for the doctor endpoints.
+        """
+        self.app.route("/doctors", methods=["GET"])(self.get_doctors)
+        self.write_router.route("/doctors", "POST", self.create_doctor)
+        self.app.route("/doctors/<int:doctor_id>/patients", methods=["GET"])(
+            self.get_doctor_patients
+        )
+        self.app.route("/patients/<patient_id>/doctors", methods=["GET"])(
+            self.get_patient_doctors
+        )
+        self.write_router.route(
+            "/doctors/<int:doctor_id>/patients", "POST", self.assign_patient
+        )
+        self.write_router.route(
+            "/doctors/<int:doctor_id>/patients/<patient_id>", "DELETE", self.unassign_patient
+        )
+
+    def get_doctors(self):
+        """
+        Retrieves all doctors with their patient counts.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        result = self.doctor_db.select_all_doctors()
+        if result is None:
+            return database_failure("select")
+        return jsonify(result), 200
+
+    def create_doctor(self):
+        """
+        Creates a new doctor.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        request_body = request.get_json(silent=True)
+        if not isinstance(request_body, dict) or set(request_body) != {DOCTOR_NAME_COLUMN}:
+            return invalid_request(
+                "Invalid doctor data", {"body": f"must only contain {DOCTOR_NAME_COLUMN}"}
+            )
+        doctor_name = request_body[DOCTOR_NAME_COLUMN]
+        if not isinstance(doctor_name, str) or not doctor_name.strip():
+            return invalid_request(
+                "Invalid doctor data", {DOCTOR_NAME_COLUMN: "must be a non-empty string"}
+            )
+        result = self.doctor_db.insert_doctor(doctor_name)
+        if result is None:
+            return database_failure("insert")
+        return jsonify({DOCTOR_ID_COLUMN: result}), 201
+
+    def get_doctor_patients(self, doctor_id):
+        """
+        Retrieves a page of the active patients of a doctor, ordered by patient
+        ID. The ``after`` query parameter takes the ``next_after`` value of the
+        previous page, and ``limit`` sets the page size.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        after = request.args.get("after", "")
+        limit = page_limit()
+        if limit is None:
+            return invalid_request(
+                "Invalid page parameters", {"limit": f"must be between 1 and {MAX_PAGE_SIZE}"}
+            )
+        doctor = self.doctor_db.select_doctor(doctor_id)
+        patients = self.doctor_db.select_doctor_patients(doctor_id, after, limit)
+        if doctor is None or patients is None:
+            return database_failure("select")
+        if not doctor:
+            return jsonify({"result": "failure", "reason": "Doctor not found"}), 404
+        next_after = patients[-1][PATIENT_ID_COLUMN] if len(patients) == limit else None
+        return (
+            jsonify(
+                {
+                    DOCTOR_ID_COLUMN: doctor_id,
+                    DOCTOR_PATIENT_COUNT_COLUMN: doctor[DOCTOR_PATIENT_COUNT_COLUMN],
+                    "patients": patients,
+                    "next_after": next_after,
+                }
+            ),
+            200,
+        )
+
+    def get_patient_doctors(self, patient_id):
+        """
+        Retrieves a page of the doctors a patient is assigned to, ordered by
+        doctor ID. The ``after`` query parameter takes the ``next_after`` value
+        of the previous page, and ``limit`` sets the page size.
+
+        Args:
+            patient_id (str): The ID of the patient.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        after = request.args.get("after", type=int)
+        if after is None:
+            if "after" in request.args:
+                return invalid_request(
+                    "Invalid page parameters", {"after": "must be a doctor ID"}
+                )
+            after = 0
+        limit = page_limit()
+        if limit is None:
+            return invalid_request(
+                "Invalid page parameters", {"limit": f"must be between 1 and {MAX_PAGE_SIZE}"}
+            )
+        doctors = self.doctor_db.select_patient_doctors(patient_id, after, limit)
+        if doctors is None:
+            return database_failure("select")
+        next_after = doctors[-1][DOCTOR_ID_COLUMN] if len(doctors) == limit else None
+        return (
+            jsonify(
+                {PATIENT_ID_COLUMN: patient_id, "doctors": doctors, "next_after": next_after}
+            ),
+            200,
+        )
+
+    def assign_patient(self, doctor_id):
+        """
+        Assigns the patient given in the request body to a doctor.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        request_body = request.get_json(silent=True)
+        if not isinstance(request_body, dict) or set(request_body) != {PATIENT_ID_COLUMN}:
+            return invalid_request(
+                "Invalid assignment data", {"body": f"must only contain {PATIENT_ID_COLUMN}"}
+            )
+        result = self.doctor_db.assign_patient(doctor_id, request_body[PATIENT_ID_COLUMN])
+        if result is None:
+            return database_failure("update")
+        if result == ALREADY_ASSIGNED:
+            return (
+                jsonify(
+                    {"result": "failure", "reason": "Patient already assigned to the doctor"}
+                ),
+                409,
+            )
+        if result == NOT_FOUND:
+            return jsonify({"result": "failure", "reason": "Doctor or patient not found"}), 404
+        return jsonify({"result": "success assigning"}), 201
+
+    def unassign_patient(self, doctor_id, patient_id):
+        """
+        Removes a patient from a doctor.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+            patient_id (str): The ID of the patient.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        result = self.doctor_db.unassign_patient(doctor_id, patient_id)
+        if result is None:
+            return database_failure("update")
+        if result == 0:
+            return jsonify({"result": "failure", "reason": "Assignment not found"}), 404
+        return jsonify({"result": "success unassigning"}), 200
@@ -0,0 +1,288 @@
+"""doctor_db module"""
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, bindparam, exists, Integer
+from patient_db_config import PATIENTS_TABLE, DOCTORS_TABLE, DOCTOR_PATIENTS_TABLE
+from patient_db_config import get_engine, get_read_engine
+
+DOCTOR_ID_PARAM = "b_doctor_id"
+DOCTOR_NAME_PARAM = "b_doctor_name"
+PATIENT_ID_PARAM = "b_patient_id"
+AFTER_PARAM = "b_after"
+LIMIT_PARAM = "b_limit"
+
+# Outcomes of DoctorDB.assign_patient.
+ASSIGNED = "assigned"
+ALREADY_ASSIGNED = "already_assigned"
+NOT_FOUND = "not_found"
+
+
+class DoctorDB:
+    """
+    A class representing the doctor database.
+
+    This class provides methods to create and list doctors, and to assign
+    patients to doctors. Every lookup goes through an index: doctor pages use
+    the (doctor_id, patient_id) primary key of the assignments with keyset
+    pagination, patient lookups use the (patient_id, doctor_id) index, and the
+    number of patients of a doctor is a column kept up to date by every
+    assignment change. Statements are built once, as in PatientDB.
+
+    Attributes:
+        insert_stmt (Insert): The statement inserting a doctor.
+        select_all_stmt (Select): The statement selecting every doctor.
+        select_by_id_stmt (Select): The statement selecting a doctor by ID.
+        select_patients_stmt (Select): The statement selecting a page of the
+        active patients of a doctor.
+        select_doctors_stmt (Select): The statement selecting a page of the
+        doctors of a patient.
+        assign_stmt (Insert): The statement assigning an existing patient to an
+        existing doctor.
+        select_assignment_stmt (Select): The statement checking whether a
+        patient is assigned to a doctor.
+        unassign_stmt (Delete): The statement removing an assignment.
+        increment_count_stmt (Update): The statement incrementing a doctor's patient count.
+        decrement_count_stmt (Update): The statement decrementing a doctor's patient count.
+
+    Methods:
+        insert_doctor: Inserts a new doctor record into the database.
+        select_all_doctors: Retrieves all doctor records from the database.
+        select_doctor: Retrieves a specific doctor record from the database.
+        select_doctor_patients: Retrieves a page of the patients of a doctor.
+        select_patient_doctors: Retrieves a page of the doctors of a patient.
+        assign_patient: Assigns a patient to a doctor.
+        unassign_patient: Removes a patient from a doctor.
+    """
+
+    def __init__(self):
+        doctors = DOCTORS_TABLE.c
+        assignments = DOCTOR_PATIENTS_TABLE.c
+        doctor_id = bindparam(DOCTOR_ID_PARAM, type_=Integer)
+        patient_id = bindparam(PATIENT_ID_PARAM)
+        self.insert_stmt = DOCTORS_TABLE.insert().values(
+            doctor_name=bindparam(DOCTOR_NAME_PARAM), patient_count=0
+        )
+        self.select_all_stmt = select(DOCTORS_TABLE).order_by(doctors.doctor_id)
+        self.select_by_id_stmt = select(DOCTORS_TABLE).where(
+            doctors.doctor_id == doctor_id
+        )
+        self.select_patients_stmt = (
+            select(PATIENTS_TABLE)
+            .join(
+                DOCTOR_PATIENTS_TABLE,
+                assignments.patient_id == PATIENTS_TABLE.c.patient_id,
+            )
+            .where(assignments.doctor_id == doctor_id)
+            .where(assignments.patient_id > bindparam(AFTER_PARAM))
+            .order_by(assignments.patient_id)
+            .limit(bindparam(LIMIT_PARAM))
+        )
+        self.select_doctors_stmt = (
+            select(DOCTORS_TABLE)
+            .join(DOCTOR_PATIENTS_TABLE, assignments.doctor_id == doctors.doctor_id)
+            .where(assignments.patient_id == patient_id)
+            .where(assignments.doctor_id > bindparam(AFTER_PARAM, type_=Integer))
+            .order_by(assignments.doctor_id)
+            .limit(bindparam(LIMIT_PARAM))
+        )
+        self.assign_stmt = (
+            DOCTOR_PATIENTS_TABLE.insert()
+            .prefix_with("OR IGNORE")
+            .from_select(
+                [assignments.doctor_id, assignments.patient_id],
+                select(doctor_id, PATIENTS_TABLE.c.patient_id)
+                .where(PATIENTS_TABLE.c.patient_id == patient_id)
+                .where(exists().where(doctors.doctor_id == doctor_id)),
+            )
+        )
+        self.select_assignment_stmt = select(assignments.doctor_id).where(
+            assignments.doctor_id == doctor_id, assignments.patient_id == patient_id
+        )
+        self.unassign_stmt = DOCTOR_PATIENTS_TABLE.delete().where(
+            assignments.doctor_id == doctor_id, assignments.patient_id == patient_id
+        )
+        self.increment_count_stmt = (
+            DOCTORS_TABLE.update()
+            .where(doctors.doctor_id == doctor_id)
+            .values(patient_count=doctors.patient_count + 1)
+        )
+        self.decrement_count_stmt = (
+            DOCTORS_TABLE.update()
+            .where(doctors.doctor_id == doctor_id)
+            .values(patient_count=doctors.patient_count - 1)
+        )
+
+    def insert_doctor(self, doctor_name):
+        """
+        Inserts a new doctor record into the database.
+
+        Args:
+            doctor_name (str): The name of the doctor.
+
+        Returns:
+            int: The ID of the inserted doctor, or None if an error occurred.
+        """
+        try:
+            conn = get_engine().connect()
+            result = conn.execute(self.insert_stmt, {DOCTOR_NAME_PARAM: doctor_name})
+            conn.commit()
+            return result.inserted_primary_key[0]
+        except SQLAlchemyError as e:
+            print("Error occurred while inserting the doctor", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_all_doctors(self):
+        """
+        Retrieves all doctor records from the database.
+
+        Returns:
+            list: A list of dictionaries representing the doctor records,
+            or None if an error occurred.
+        """
+        try:
+            conn = get_read_engine().connect()
+            result = conn.execute(self.select_all_stmt)
+            return [dict(row) for row in result.mappings()]
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting all doctors", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_doctor(self, doctor_id):
+        """
+        Retrieves a specific doctor record from the database.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+
+        Returns:
+            dict: A dictionary representing the doctor record, an empty dictionary
+            if there is no such doctor, or None if an error occurred.
+        """
+        try:
+            conn = get_read_engine().connect()
+            row = conn.execute(
+                self.select_by_id_stmt, {DOCTOR_ID_PARAM: doctor_id}
+            ).mappings().fetchone()
+            return dict(row) if row is not None else {}
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting the doctor", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_doctor_patients(self, doctor_id, after, limit):
+        """
+        Retrieves a page of the active patients assigned to a doctor, ordered by
+        patient ID.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+            after (str): Only patients with a greater ID are returned.
+            limit (int): The maximum number of patients to return.
+
+        Returns:
+            list: A list of dictionaries representing the patient records,
+            or None if an error occurred.
+        """
+        try:
+            conn = get_read_engine().connect()
+            result = conn.execute(
+                self.select_patients_stmt,
+                {DOCTOR_ID_PARAM: doctor_id, AFTER_PARAM: after, LIMIT_PARAM: limit},
+            )
+            return [dict(row) for row in result.mappings()]
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting the patients of the doctor", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_patient_doctors(self, patient_id, after, limit):
+        """
+        Retrieves a page of the doctors a patient is assigned to, ordered by
+        doctor ID.
+
+        Args:
+            patient_id (str): The ID of the patient.
+            after (int): Only doctors with a greater ID are returned.
+            limit (int): The maximum number of doctors to return.
+
+        Returns:
+            list: A list of dictionaries representing the doctor records,
+            or None if an error occurred.
+        """
+        try:
+            conn = get_read_engine().connect()
+            result = conn.execute(
+                self.select_doctors_stmt,
+                {PATIENT_ID_PARAM: patient_id, AFTER_PARAM: after, LIMIT_PARAM: limit},
+            )
+            return [dict(row) for row in result.mappings()]
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting the doctors of the patient", e)
+            return None
+        finally:
+            conn.close()
+
+    def assign_patient(self, doctor_id, patient_id):
+        """
+        Assigns an active patient to a doctor and increments the doctor's
+        patient count in the same transaction. When nothing is inserted, the
+        same transaction checks whether the assignment already exists.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+            patient_id (str): The ID of the patient.
+
+        Returns:
+            str: ASSIGNED if the patient was assigned, ALREADY_ASSIGNED if the
+            patient is already assigned to the doctor, NOT_FOUND if the doctor
+            or patient does not exist, or None if an error occurred.
+        """
+        params = {DOCTOR_ID_PARAM: doctor_id, PATIENT_ID_PARAM: patient_id}
+        try:
+            conn = get_engine().connect()
+            if conn.execute(self.assign_stmt, params).rowcount:
+                conn.execute(self.increment_count_stmt, params)
+                outcome = ASSIGNED
+            elif conn.execute(self.select_assignment_stmt, params).first() is not None:
+                outcome = ALREADY_ASSIGNED
+            else:
+                outcome = NOT_FOUND
+            conn.commit()
+            return outcome
+        except SQLAlchemyError as e:
+            print("Error occurred while assigning the patient", e)
+            return None
+        finally:
+            conn.close()
+
+    def unassign_patient(self, doctor_id, patient_id):
+        """
+        Removes a patient from a doctor and decrements the doctor's patient
+        count in the same transaction.
+
+        Args:
+            doctor_id (int): The ID of the doctor.
+            patient_id (str): The ID of the patient.
+
+        Returns:
+            int: The number of removed assignments, or None if an error occurred.
+        """
+        params = {DOCTOR_ID_PARAM: doctor_id, PATIENT_ID_PARAM: patient_id}
+        try:
+            conn = get_engine().connect()
+            removed = conn.execute(self.unassign_stmt, params).rowcount
+            if removed:
+                conn.execute(self.decrement_count_stmt, params)
+            conn.commit()
+            return removed
+        except SQLAlchemyError as e:
+            print("Error occurred while unassigning the patient", e)
+            return None
+        finally:
+            conn.close()
@@ -1,14 +1,39 @@
 """StreamLit front-end for the patient management system"""
 
+import uuid
 import streamlit as st
 import requests
 import pandas as pd
 from patient import Patient
+from admission import CLIENT_ID_HEADER
 
 PATIENTS_API_URL = "http://localhost:5000/patients"
 PATIENT_API_URL = "http://localhost:5000/patient"
 
 
+def client_id():
+    """
+    Identifies the browser session, so that the API rate limits every user of
+    the portal separately rather than the portal as a whole.
+
+    Returns:
+        str: The identifier of the current session.
+    """
+    if "client_id" not in st.session_state:
+        st.session_state["client_id"] = str(uuid.uuid4())
+    return st.session_state["client_id"]
+
+
+def client_headers():
+    """
+    Builds the headers identifying the current session to the API.
+
+    Returns:
+        dict: The request headers.
+    """
+    return {CLIENT_ID_HEADER: client_id()}
+
+
 class Tab:
     """Base class for all the tabs in the app"""
 
@@ -34,7 +59,7 @@ class ListPatientsTab(Tab):
         Returns:
             None
         """
-        response = requests.get(PATIENTS_API_URL, timeout=5)
+        response = requests.get(PATIENTS_API_URL, headers=client_headers(), timeout=5)
         if response.status_code == 200:
             # create a table to show the data
             try:
@@ -100,7 +125,7 @@ class InsertPatientTab(Tab):
         patient.set_room(patient_room)
         patient.set_checkin_time()
 
-        response = patient.commit()
+        response = patient.commit(client_id())
         if response.status_code == 201:
             st.write("Patient inserted successfully")
         else:
@@ -137,7 +162,7 @@ class UpdatePatientTab(Tab):
                 patient_id = payload["patient_id"]
                 print(patient_id)
                 uri = PATIENT_API_URL+"/"+patient_id
-                response = requests.put(uri, json=payload, timeout=5)
+                response = requests.put(uri, json=payload, headers=client_headers(), timeout=5)
                 if response.status_code == 200:
                     st.write(f"Patient id {patient_id} has been updated")
                 else:
@@ -148,7 +173,11 @@ class UpdatePatientTab(Tab):
         """Search patients with the search bar"""
         search_term = st.text_input("Search Patient By Name")
         if search_term:
-            response = requests.get(PATIENTS_API_URL + "?search_name=" + search_term, timeout=5)
+            response = requests.get(
+                PATIENTS_API_URL + "?search_name=" + search_term,
+                headers=client_headers(),
+                timeout=5,
+            )
             if response.status_code == 200:
                 patient_data = response.json()
                 try:
@@ -166,7 +195,7 @@ class UpdatePatientTab(Tab):
             else:
                 st.write("Failed to fetch the Patients")
         else:
-            response = requests.get(PATIENTS_API_URL, timeout=5)
+            response = requests.get(PATIENTS_API_URL, headers=client_headers(), timeout=5)
             if response.status_code == 200:
                 patient_data = response.json()
                 try:
@@ -0,0 +1,304 @@
+"""
+Synthetic patient generator for scale testing.
+
+Builds a SQLite database with the application schema and fills it with N
+realistic patients: wards and rooms from config.WARD_NUMBERS and
+config.ROOM_NUMBERS, genders from config.GENDERS, check-ins spread over the
+last two years and, for discharged patients, check-outs after an
+exponentially distributed stay. Each patient is optionally assigned to a
+random doctor.
+
+The rows are written through sqlite3 executemany in a single transaction,
+with journaling and syncing turned off, and secondary indexes and change log
+triggers dropped during the load and created again afterwards, so a million
+rows load in well under a minute, most of it spent generating the rows in
+Python.
+
+Usage:
+    python src/generate_patients.py --count 1000000 --db scale.db [--seed 1]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import time
+import uuid
+from config import GENDERS, WARD_NUMBERS, ROOM_NUMBERS, PATIENT_AGE_RANGE
+
+FIRST_NAMES = [
+    "Anna", "Bence", "Csilla", "David", "Emma", "Ferenc", "Gabriella", "Hanna",
+    "Istvan", "Julia", "Krisztian", "Laura", "Mate", "Nora", "Oliver", "Petra",
+    "Ahmed", "Fatima", "Hassan", "Ayesha", "Omar", "Sara", "Yusuf", "Zainab",
+    "James", "Mary", "John", "Linda", "Michael", "Susan", "Robert", "Karen",
+]
+LAST_NAMES = [
+    "Nagy", "Kovacs", "Toth", "Szabo", "Horvath", "Varga", "Kiss", "Molnar",
+    "Nemeth", "Farkas", "Balogh", "Papp", "Khan", "Ahmed", "Hussain", "Malik",
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Wilson",
+]
+CHECKIN_WINDOW_DAYS = 730
+MEAN_STAY_DAYS = 5
+BATCH_SIZE = 50000
+MAX_REALISTIC_AGE = 105
+
+
+def generate_patients(count, seed, discharged_fraction):
+    """
+    Generates patient rows in the column order of PATIENTS_TABLE.
+
+    Args:
+        count (int): The number of patients to generate.
+        seed (int): The random seed, so that the same database can be rebuilt.
+        discharged_fraction (float): The share of patients with a check-out time.
+
+    Yields:
+        tuple: One patient row.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now().replace(microsecond=0)
+    rooms = {ward: [int(room) for room in ROOM_NUMBERS[ward]] for ward in WARD_NUMBERS}
+    min_age = PATIENT_AGE_RANGE[0]
+    max_age = min(PATIENT_AGE_RANGE[1], MAX_REALISTIC_AGE)
+    for _ in range(count):
+        ward = rng.choice(WARD_NUMBERS)
+        checkin = now - datetime.timedelta(seconds=rng.randrange(CHECKIN_WINDOW_DAYS * 86400))
+        # Patient.commit writes the check-out time of an admitted patient as
+        # str(None), so the fixture does the same.
+        checkout = "None"
+        if rng.random() < discharged_fraction:
+            stay = datetime.timedelta(days=rng.expovariate(1 / MEAN_STAY_DAYS))
+            checkout = str(min(checkin + stay, now))
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            min(max_age, max(min_age, int(rng.gauss(50, 20)))),
+            rng.choice(GENDERS),
+            str(checkin),
+            checkout,
+            ward,
+            rng.choice(rooms[ward]),
+        )
+
+
+class BulkLoader:
+    """
+    Inserts patient rows, and optionally one doctor assignment per patient,
+    through a sqlite3 connection inside a single transaction.
+
+    Attributes:
+        conn (Connection): The sqlite3 connection, inside a transaction.
+        insert_patient (str): The patient insert statement.
+        insert_assignment (str): The assignment insert statement.
+        doctor_ids (list): The doctors to assign patients to, or an empty list.
+        counts (dict): Doctor ID to the number of patients assigned so far.
+        rng (Random): The random generator for the assignments.
+
+    Methods:
+        load(rows): Inserts every row, batch by batch.
+        load_batch(batch): Inserts one batch of patients and their assignments.
+        update_counts(): Adds the assigned patients to the doctor patient counts.
+    """
+
+    def __init__(self, conn, doctor_ids, seed):
+        # pylint: disable=import-outside-toplevel
+        from patient_db_config import PATIENTS_TABLE, DOCTOR_PATIENTS_TABLE
+
+        columns = [column.name for column in PATIENTS_TABLE.columns]
+        self.conn = conn
+        self.insert_patient = (
+            f"INSERT INTO {PATIENTS_TABLE.name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        self.insert_assignment = f"INSERT INTO {DOCTOR_PATIENTS_TABLE.name} VALUES (?, ?)"
+        self.doctor_ids = doctor_ids
+        self.counts = dict.fromkeys(doctor_ids, 0)
+        self.rng = random.Random(seed)
+
+    def load(self, rows):
+        """
+        Inserts every row, in batches of BATCH_SIZE.
+
+        Args:
+            rows (iterable): The patient rows to insert.
+
+        Returns:
+            int: The number of inserted patients.
+        """
+        inserted = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                inserted += self.load_batch(batch)
+                batch = []
+        return inserted + self.load_batch(batch)
+
+    def load_batch(self, batch):
+        """
+        Inserts one batch of patients and their doctor assignments.
+
+        Args:
+            batch (list): The patient rows.
+
+        Returns:
+            int: The number of inserted patients.
+        """
+        self.conn.executemany(self.insert_patient, batch)
+        if self.doctor_ids:
+            assignments = [(self.rng.choice(self.doctor_ids), row[0]) for row in batch]
+            for doctor_id, _patient_id in assignments:
+                self.counts[doctor_id] += 1
+            self.conn.executemany(self.insert_assignment, assignments)
+        return len(batch)
+
+    def update_counts(self):
+        """
+        Adds the patients assigned so far to the patient counts of the doctors.
+        """
+        self.conn.executemany(
+            "UPDATE doctors SET patient_count = patient_count + ? WHERE doctor_id = ?",
+            [(count, doctor_id) for doctor_id, count in self.counts.items()],
+        )
+
+
+def drop_secondary_indexes():
+    """
+    Drops the secondary indexes and the change log triggers, so that rows are
+    inserted without maintaining them.
+
+    Returns:
+        list: The dropped indexes, to be created again after the load.
+    """
+    # pylint: disable=import-outside-toplevel
+    from patient_db_config import PATIENTS_TABLE, DOCTOR_PATIENTS_TABLE
+    from patient_db_config import PATIENT_CHANGE_TRIGGERS, get_engine
+
+    engine = get_engine()
+    secondary_indexes = list(PATIENTS_TABLE.indexes) + list(DOCTOR_PATIENTS_TABLE.indexes)
+    for index in secondary_indexes:
+        index.drop(engine, checkfirst=True)
+    # The change log only serves readers catching up with writes, so the
+    # generated rows are not logged.
+    with engine.begin() as connection:
+        for name in PATIENT_CHANGE_TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    engine.dispose()
+    return secondary_indexes
+
+
+def restore_secondary_indexes(secondary_indexes):
+    """
+    Creates the dropped indexes and triggers again, and updates the query
+    planner statistics.
+
+    Args:
+        secondary_indexes (list): The indexes returned by drop_secondary_indexes.
+    """
+    # pylint: disable=import-outside-toplevel
+    from patient_db_config import get_engine, init_schema
+
+    engine = get_engine()
+    for index in secondary_indexes:
+        index.create(engine)
+    init_schema()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+
+def bulk_load(db_path, rows, doctor_ids, seed):
+    """
+    Loads patient rows, and optionally one doctor assignment per patient, into
+    a database whose schema already exists.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        rows (iterable): The patient rows to insert.
+        doctor_ids (list): The doctors to assign patients to, or an empty list.
+        seed (int): The random seed for the assignments.
+
+    Returns:
+        int: The number of inserted patients.
+    """
+    secondary_indexes = drop_secondary_indexes()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("PRAGMA cache_size=-262144")
+        conn.execute("BEGIN")
+        loader = BulkLoader(conn, doctor_ids, seed)
+        inserted = loader.load(rows)
+        loader.update_counts()
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+    restore_secondary_indexes(secondary_indexes)
+    return inserted
+
+
+def build_database(db_path, count, seed=1, discharged_fraction=0.7, assign_doctors=True):
+    """
+    Creates a database with the application schema and fills it with
+    synthetic patients. Used by the CLI and by scale benchmarks as a fixture.
+
+    Args:
+        db_path (str): Path of the database file to create. It must not exist.
+        count (int): The number of patients to generate.
+        seed (int, optional): The random seed. Defaults to 1.
+        discharged_fraction (float, optional): The share of discharged patients.
+        assign_doctors (bool, optional): Whether to assign every patient to a doctor.
+
+    Returns:
+        int: The number of inserted patients.
+
+    Raises:
+        FileExistsError: If the database file already exists.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    os.environ["PATIENT_DB_PATH"] = db_path
+    os.environ.setdefault("PATIENT_DB_ECHO", "0")
+    # pylint: disable=import-outside-toplevel
+    from patient_db_config import init_schema, DB_FILE_PATH
+
+    if DB_FILE_PATH != db_path:
+        raise RuntimeError("patient_db_config was imported with another database path")
+    init_schema()
+    doctor_ids = []
+    if assign_doctors:
+        conn = sqlite3.connect(db_path)
+        try:
+            doctor_ids = [row[0] for row in conn.execute("SELECT doctor_id FROM doctors")]
+        finally:
+            conn.close()
+    rows = generate_patients(count, seed, discharged_fraction)
+    return bulk_load(db_path, rows, doctor_ids, seed)
+
+
+def main():
+    """
+    Parses the command line and builds the database.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--discharged-fraction", type=float, default=0.7)
+    parser.add_argument("--no-doctors", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    inserted = build_database(
+        args.db, args.count, args.seed, args.discharged_fraction, not args.no_doctors
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {inserted} patients in {elapsed:.1f}s ({inserted / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
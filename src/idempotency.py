@@ -0,0 +1,112 @@
+"""Bounded in-memory store of responses to requests sent with an Idempotency-Key."""
+
+import threading
+import time
+from collections import OrderedDict
+from config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+# A 409 response names its cause in this body field, so that a client tells a
+# retry to send again later from a conflict with existing data.
+CONFLICT_FIELD = "conflict"
+CONFLICT_IN_PROGRESS = IN_PROGRESS
+CONFLICT_EXISTS = "exists"
+
+
+class IdempotencyStore:
+    """
+    Remembers the response to each idempotency key for a limited time.
+
+    A retried write carrying the same key gets the stored response back
+    without touching the database. Entries expire after ``ttl`` seconds and
+    the least recently stored entries are evicted beyond ``max_keys``, so the
+    memory used is bounded whatever the request rate.
+
+    Attributes:
+        ttl (float): Seconds a stored response is kept.
+        max_keys (int): The maximum number of keys kept.
+        entries (OrderedDict): Key to (expiry, fingerprint, response), oldest first.
+        lock (Lock): Guards the entries across request threads.
+
+    Methods:
+        begin(key, fingerprint): Claims a key, or returns what is known about it.
+        complete(key, response): Stores the response for a claimed key.
+        abandon(key): Releases a claimed key without storing a response.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS, max_keys=IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def evict(self, now):
+        """
+        Drops expired entries and the oldest entries beyond max_keys. Must be
+        called with the lock held.
+
+        Args:
+            now (float): The current monotonic time.
+        """
+        while self.entries:
+            key, (expiry, _fingerprint, _response) = next(iter(self.entries.items()))
+            if expiry > now and len(self.entries) <= self.max_keys:
+                break
+            del self.entries[key]
+
+    def begin(self, key, fingerprint):
+        """
+        Claims a key for a new request, or returns the stored outcome of an
+        earlier request with the same key.
+
+        Args:
+            key (str): The idempotency key sent by the client.
+            fingerprint (tuple): Identifies the request the key was first used with.
+
+        Returns:
+            tuple: The state (NEW, REPLAY, IN_PROGRESS or MISMATCH) and, for
+            REPLAY, the stored response.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.evict(now)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.entries[key] = (now + self.ttl, fingerprint, None)
+                return NEW, None
+            _expiry, stored_fingerprint, response = entry
+            if stored_fingerprint != fingerprint:
+                return MISMATCH, None
+            if response is None:
+                return IN_PROGRESS, None
+            return REPLAY, response
+
+    def complete(self, key, response):
+        """
+        Stores the response of a claimed key.
+
+        Args:
+            key (str): The idempotency key.
+            response (tuple): The response body, status code and content type.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = (time.monotonic() + self.ttl, entry[1], response)
+
+    def abandon(self, key):
+        """
+        Releases a claimed key so that a retry runs the request again.
+
+        Args:
+            key (str): The idempotency key.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
@@ -0,0 +1,414 @@
+"""Pre-serialized, pre-compressed snapshot of the patient list view."""
+
+import bisect
+import json
+import struct
+import threading
+import time
+import zlib
+from config import SNAPSHOT_MAX_STALENESS_MS, SNAPSHOT_COMPRESS_LEVEL, SNAPSHOT_CHUNK_ROWS
+from patient_columns import PATIENT_ID_COLUMN, PATIENT_WARD_COLUMN
+from patient_db_config import get_read_engine
+
+# The key of the list of every ward. Patients without a ward, from before
+# wards were validated, have the ward None and only appear in this list.
+ALL_WARDS = object()
+# A gzip member header: deflate, no flags, no modification time, unknown OS.
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# How many times data_version is polled within the staleness bound.
+POLLS_PER_STALENESS_BOUND = 5
+
+
+def deflate(data, final=False):
+    """
+    Compresses data as an independent piece of a raw deflate stream.
+
+    Each piece is compressed on its own and ends on a byte boundary, so
+    pieces can be concatenated in any order, followed by a final piece, into
+    a valid deflate stream of the concatenated data.
+
+    Args:
+        data (bytes): The data to compress.
+        final (bool, optional): Whether the piece ends the stream.
+
+    Returns:
+        bytes: The compressed piece.
+    """
+    compressor = zlib.compressobj(SNAPSHOT_COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+    )
+
+
+OPEN_PIECE = deflate(b"[")
+SEPARATOR_PIECE = deflate(b",")
+CLOSE_PIECE = deflate(b"]\n", final=True)
+
+
+def list_keys(ward):
+    """
+    Returns the keys of the lists a patient of a ward belongs to.
+
+    Args:
+        ward (int): The ward of the patient, or None.
+
+    Returns:
+        tuple: ALL_WARDS, and the ward unless it is None.
+    """
+    return (ALL_WARDS,) if ward is None else (ALL_WARDS, ward)
+
+
+class SnapshotChunk:
+    """
+    A run of consecutive serialized patients of a list, with their joined JSON
+    and its compressed piece cached until one of the rows changes.
+
+    Attributes:
+        rows (dict): Rowid to the JSON bytes of the patient.
+        last_rowid (int): No rowid in the chunk is greater than this.
+        body (bytes): The rows joined with commas, or None when outdated.
+        compressed (bytes): The body as a deflate piece, or None when outdated.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.last_rowid = 0
+        self.body = None
+        self.compressed = None
+
+    def encode(self):
+        """
+        Joins and compresses the rows again if they changed since the last call.
+        """
+        if self.body is None:
+            self.body = b",".join(self.rows[rowid] for rowid in sorted(self.rows))
+            self.compressed = deflate(self.body)
+
+
+class SnapshotList:
+    """
+    The serialized patients of one list, in rowid order like the database
+    query, split into chunks of consecutive patients.
+
+    Attributes:
+        chunk_rows (int): The maximum number of patients per chunk.
+        starts (list): The smallest rowid each chunk may hold, in order.
+        chunks (list): The chunks, in the order of their starts.
+
+    Methods:
+        chunk_index(rowid): Finds the chunk a rowid belongs to.
+        put(rowid, row): Adds a patient to the chunk its rowid belongs to.
+        remove(rowid): Removes a patient from its chunk.
+        split(index): Splits a chunk in two halves.
+    """
+
+    def __init__(self, chunk_rows):
+        self.chunk_rows = chunk_rows
+        self.starts = []
+        self.chunks = []
+
+    def chunk_index(self, rowid):
+        """
+        Finds the chunk a rowid belongs to.
+
+        Args:
+            rowid (int): The rowid of a patient.
+
+        Returns:
+            int: The index of the chunk.
+        """
+        return max(bisect.bisect_right(self.starts, rowid) - 1, 0)
+
+    def put(self, rowid, row):
+        """
+        Adds a patient to the chunk its rowid belongs to. A patient past the
+        end of a full last chunk, as every new patient is, starts a new chunk.
+
+        Args:
+            rowid (int): The rowid of the patient.
+            row (bytes): The JSON bytes of the patient.
+        """
+        index = self.chunk_index(rowid)
+        if not self.chunks or (
+            index == len(self.chunks) - 1
+            and rowid > self.chunks[index].last_rowid
+            and len(self.chunks[index].rows) >= self.chunk_rows
+        ):
+            self.starts.append(rowid)
+            self.chunks.append(SnapshotChunk())
+            index = len(self.chunks) - 1
+        chunk = self.chunks[index]
+        self.starts[index] = min(self.starts[index], rowid)
+        chunk.rows[rowid] = row
+        chunk.last_rowid = max(chunk.last_rowid, rowid)
+        chunk.body = None
+        if len(chunk.rows) > self.chunk_rows:
+            self.split(index)
+
+    def remove(self, rowid):
+        """
+        Removes a patient from its chunk, and the chunk when it is left empty.
+
+        Args:
+            rowid (int): The rowid of the patient.
+        """
+        index = self.chunk_index(rowid)
+        chunk = self.chunks[index]
+        del chunk.rows[rowid]
+        chunk.body = None
+        if not chunk.rows:
+            del self.chunks[index]
+            del self.starts[index]
+
+    def split(self, index):
+        """
+        Splits a chunk in two halves.
+
+        Args:
+            index (int): The index of the chunk.
+        """
+        chunk = self.chunks[index]
+        rowids = sorted(chunk.rows)
+        middle = len(rowids) // 2
+        tail = SnapshotChunk()
+        for rowid in rowids[middle:]:
+            tail.rows[rowid] = chunk.rows.pop(rowid)
+        tail.last_rowid = chunk.last_rowid
+        chunk.last_rowid = rowids[middle - 1]
+        self.chunks.insert(index + 1, tail)
+        self.starts.insert(index + 1, rowids[middle])
+
+
+class ListSnapshot(threading.Thread):
+    """
+    Background thread keeping the response of the patient list view ready.
+
+    The list of active patients, and the list of each ward, are kept as JSON
+    bytes and as gzip bytes, so a request is answered without touching the
+    database or serializing anything. The thread polls ``PRAGMA data_version``
+    on its own connection, which changes whenever any other connection, in
+    this process or another one, commits, and then reads the IDs of the
+    changed patients from the change log kept by the patients table triggers.
+
+    Only the changed rows are read and serialized again. Each list is kept in
+    rowid order, the order the database query returns, in chunks of at most
+    ``chunk_rows`` patients, each with its JSON and its compressed deflate
+    piece cached, so only the chunks holding a changed row are compressed
+    again. A list is then assembled by joining the cached pieces, which costs
+    a copy and a CRC of the list but no compression. A full rebuild only
+    happens at start, after an error, and when the change log was pruned past
+    the last change seen.
+
+    The snapshot is only served while it is known to be at most
+    ``max_staleness_ms`` behind the database; otherwise get() returns None and
+    the caller reads the database instead.
+
+    Attributes:
+        patient_db (PatientDB): The patient database instance.
+        max_staleness (float): Seconds the served snapshot may lag behind the database.
+        interval (float): Seconds between two data_version polls.
+        chunk_rows (int): The maximum number of patients per chunk.
+        lists (dict): Ward, or ALL_WARDS, to the SnapshotList of its patients.
+        Patients without a ward only appear in the ALL_WARDS list.
+        locations (dict): Patient ID to the rowid and ward of the patient.
+        views (dict): Ward, or ALL_WARDS, to the (JSON bytes, gzip bytes) of its list.
+        empty_view (tuple): The (JSON bytes, gzip bytes) of an empty list.
+        last_seq (int): The last change log entry applied, or None before the first build.
+        checked_at (float): The monotonic time at which the snapshot was last
+        known to match the database.
+        stopped (Event): Set to stop the thread.
+
+    Methods:
+        get(ward): Returns the serialized list of all patients or of a ward.
+        serialize(chunks): Assembles chunks into a JSON array and its gzip form.
+        apply(patient_ids, rows): Moves changed patients into their lists.
+        publish(keys, rebuilt): Assembles the changed lists.
+        refresh(): Applies the changes since the last refresh.
+        run(): Refreshes the snapshot whenever the database changes.
+        stop(): Asks the thread to stop.
+    """
+
+    def __init__(
+        self,
+        patient_db,
+        max_staleness_ms=SNAPSHOT_MAX_STALENESS_MS,
+        chunk_rows=SNAPSHOT_CHUNK_ROWS,
+    ):
+        super().__init__(name="list-snapshot", daemon=True)
+        self.patient_db = patient_db
+        self.max_staleness = max_staleness_ms / 1000
+        self.interval = self.max_staleness / POLLS_PER_STALENESS_BOUND
+        self.chunk_rows = chunk_rows
+        self.lists = {}
+        self.locations = {}
+        self.views = {}
+        self.empty_view = self.serialize([])
+        self.last_seq = None
+        self.checked_at = float("-inf")
+        self.stopped = threading.Event()
+
+    def get(self, ward=None):
+        """
+        Returns the serialized list of all active patients, or of one ward.
+
+        Args:
+            ward (int, optional): The ward to list, or None for every ward.
+
+        Returns:
+            tuple: The JSON bytes and gzip bytes of the list, or None if no
+            snapshot was built yet or it may be staler than the bound.
+        """
+        views = self.views
+        if not views or time.monotonic() - self.checked_at > self.max_staleness:
+            return None
+        return views.get(ALL_WARDS if ward is None else ward, self.empty_view)
+
+    def serialize(self, chunks):
+        """
+        Assembles chunks into a JSON array matching jsonify's output, and its
+        gzip form, from the cached pieces of the chunks.
+
+        Args:
+            chunks (list): The chunks holding the rows, in order.
+
+        Returns:
+            tuple: The JSON bytes and gzip bytes of the array.
+        """
+        chunks = [chunk for chunk in chunks if chunk.rows]
+        body_parts = [b"["]
+        compressed_parts = [GZIP_HEADER, OPEN_PIECE]
+        for chunk in chunks:
+            chunk.encode()
+            if len(body_parts) > 1:
+                body_parts.append(b",")
+                compressed_parts.append(SEPARATOR_PIECE)
+            body_parts.append(chunk.body)
+            compressed_parts.append(chunk.compressed)
+        body_parts.append(b"]\n")
+        body = b"".join(body_parts)
+        compressed_parts.append(CLOSE_PIECE)
+        compressed_parts.append(struct.pack("<II", zlib.crc32(body), len(body) & 0xFFFFFFFF))
+        return body, b"".join(compressed_parts)
+
+    def apply(self, patient_ids, rows):
+        """
+        Moves changed patients out of the lists they were in and into the
+        lists of their current ward, at the place of their rowid.
+
+        Args:
+            patient_ids (list): The IDs of the changed patients.
+            rows (list): The (rowid, record) of the changed patients still
+            active; the other IDs were deleted or archived.
+
+        Returns:
+            set: The keys of the lists that changed.
+        """
+        keys = set()
+        # Every changed patient is removed before any is added back, since a
+        # deleted patient's rowid may be reused by an inserted one.
+        for patient_id in patient_ids:
+            location = self.locations.pop(patient_id, None)
+            if location is None:
+                continue
+            rowid, ward = location
+            for key in list_keys(ward):
+                self.lists[key].remove(rowid)
+                keys.add(key)
+        for rowid, patient in rows:
+            ward = patient[PATIENT_WARD_COLUMN]
+            # Same key order and separators as Flask's default JSON provider.
+            row = json.dumps(patient, sort_keys=True, separators=(",", ":")).encode()
+            for key in list_keys(ward):
+                if key not in self.lists:
+                    self.lists[key] = SnapshotList(self.chunk_rows)
+                self.lists[key].put(rowid, row)
+                keys.add(key)
+            self.locations[patient[PATIENT_ID_COLUMN]] = (rowid, ward)
+        return keys
+
+    def publish(self, keys, rebuilt=False):
+        """
+        Assembles the changed lists, and makes them visible to get().
+
+        Args:
+            keys (set): The keys of the lists that changed.
+            rebuilt (bool, optional): Whether every list was rebuilt, so the
+            lists not among the keys no longer exist.
+        """
+        views = {} if rebuilt else dict(self.views)
+        for key in keys:
+            chunks = self.lists[key].chunks
+            if chunks or key is ALL_WARDS:
+                views[key] = self.serialize(chunks)
+            else:
+                del self.lists[key]
+                views.pop(key, None)
+        views.setdefault(ALL_WARDS, self.empty_view)
+        self.views = views
+
+    def refresh(self):
+        """
+        Applies the changes made since the last refresh, or rebuilds the
+        snapshot from every active patient when the changes are not known.
+
+        Returns:
+            bool: True if the snapshot was refreshed, False if a read failed.
+        """
+        changes = self.patient_db.select_changes(self.last_seq)
+        if changes is None:
+            return False
+        last_seq, patient_ids = changes
+        rebuilt = patient_ids is None
+        if patient_ids is not None and not patient_ids:
+            self.last_seq = last_seq
+            return True
+        rows = self.patient_db.select_patient_rows(patient_ids)
+        if rows is None:
+            return False
+        if rebuilt:
+            self.lists = {}
+            self.locations = {}
+            patient_ids = []
+        self.publish(self.apply(patient_ids, rows), rebuilt)
+        self.last_seq = last_seq
+        return True
+
+    def run(self):
+        """
+        Refreshes the snapshot whenever the database changes, until stopped.
+
+        An error in a pass is logged and the snapshot is rebuilt on the next
+        pass, with a new connection; until then it ages past the staleness
+        bound and requests read the database.
+        """
+        conn = None
+        version = None
+        try:
+            while not self.stopped.is_set():
+                polled = time.monotonic()
+                try:
+                    if conn is None:
+                        conn = get_read_engine().connect()
+                    current = conn.exec_driver_sql("PRAGMA data_version").scalar()
+                    conn.rollback()
+                    if current != version and self.refresh():
+                        version = current
+                    if current == version:
+                        self.checked_at = polled
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    print("Error occurred while refreshing the list snapshot", e)
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+                    version = None
+                    self.last_seq = None
+                self.stopped.wait(self.interval)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def stop(self):
+        """
+        Asks the thread to stop.
+        """
+        self.stopped.set()
@@ -2,17 +2,61 @@
 
 import uuid
 import datetime
-import requests
+from time import sleep
 from config import WARD_NUMBERS, ROOM_NUMBERS, API_CONTROLLER_URL
+from idempotency import IDEMPOTENCY_KEY_HEADER
+from idempotency import CONFLICT_FIELD, CONFLICT_IN_PROGRESS, CONFLICT_EXISTS
+from admission import CLIENT_ID_HEADER
+
+from patient_columns import PATIENT_ID_COLUMN
+from patient_columns import PATIENT_NAME_COLUMN
+from patient_columns import PATIENT_AGE_COLUMN
+from patient_columns import PATIENT_GENDER_COLUMN
+from patient_columns import PATIENT_CHECKIN_COLUMN
+from patient_columns import PATIENT_CHECKOUT_COLUMN
+from patient_columns import PATIENT_WARD_COLUMN
+from patient_columns import PATIENT_ROOM_COLUMN
+
+COMMIT_ATTEMPTS = 3
+# A retry that reaches the API while the first attempt is still running is
+# told to wait. Both it and a retry after a connection failure are sent again
+# after a growing delay, so that clients do not hammer a struggling server.
+IN_PROGRESS_ATTEMPTS = 8
+BACKOFF_SECONDS = 0.25
+MAX_BACKOFF_SECONDS = 2.0
+
+
+def backoff_delay(retry):
+    """
+    Returns how long to wait before a retry.
+
+    Args:
+        retry (int): How many retries of the request were already sent.
+
+    Returns:
+        float: The delay in seconds, doubling with each retry up to a cap.
+    """
+    return min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2**retry)
+
 
-from patient_db_config import PATIENT_ID_COLUMN
-from patient_db_config import PATIENT_NAME_COLUMN
-from patient_db_config import PATIENT_AGE_COLUMN
-from patient_db_config import PATIENT_GENDER_COLUMN
-from patient_db_config import PATIENT_CHECKIN_COLUMN
-from patient_db_config import PATIENT_CHECKOUT_COLUMN
-from patient_db_config import PATIENT_WARD_COLUMN
-from patient_db_config import PATIENT_ROOM_COLUMN
+def conflict_reason(response):
+    """
+    Reads the cause of a 409 response.
+
+    Args:
+        response (Response): The API response.
+
+    Returns:
+        str: The conflict field of the response body, or None if the response
+        is not a 409 or names no cause.
+    """
+    if response.status_code != 409:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body.get(CONFLICT_FIELD) if isinstance(body, dict) else None
 
 
 class Patient:
@@ -221,19 +265,74 @@ class Patient:
             PATIENT_ROOM_COLUMN: int(self._room_number),
         }
 
-    def commit(self):
+    def send_write(self, method, url, idempotency_key, client_id=None):
         """
-        Commits the patient data to the database.
+        Sends a write request, retrying on connection errors and timeouts with
+        the same Idempotency-Key so that the API applies it at most once. A 409
+        naming an in-progress conflict means the first attempt is still
+        running. Both kinds of retry are sent after a capped exponential
+        backoff, until the outcome is known or the attempts run out.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL to send the request to.
+            idempotency_key (str): The key identifying this write.
+            client_id (str, optional): Identifies the client for rate limiting.
+
+        Returns:
+            Response: The API response.
+
+        Raises:
+            RequestException: If every attempt failed.
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        headers = {IDEMPOTENCY_KEY_HEADER: idempotency_key}
+        if client_id is not None:
+            headers[CLIENT_ID_HEADER] = client_id
+        failures = 0
+        waits = 0
+        while True:
+            try:
+                response = requests.request(
+                    method,
+                    url,
+                    json=self.create_patient_payload(),
+                    headers=headers,
+                    timeout=5,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                failures += 1
+                if failures == COMMIT_ATTEMPTS:
+                    raise
+                sleep(backoff_delay(failures - 1))
+                continue
+            in_progress = conflict_reason(response) == CONFLICT_IN_PROGRESS
+            if not in_progress or waits == IN_PROGRESS_ATTEMPTS:
+                return response
+            sleep(backoff_delay(waits))
+            waits += 1
+
+    def commit(self, client_id=None):
         """
-        url = f"{API_CONTROLLER_URL}/patients"
+        Commits the patient data to the database.
 
-        list_patients = requests.get(url)
-        if list_patients.status_code == 200:
-            list_patients = list_patients.json()
-            list_patients_ids = [patient["patient_id"] for patient in list_patients]
-            if self._id in list_patients_ids:
-                return requests.put(url, json=self.create_patient_payload(), timeout=5)
-            else:
-                return requests.post(url, json=self.create_patient_payload(), timeout=5)
+        The patient is created, or updated if it already exists. Each request
+        carries an Idempotency-Key, so retries after a timeout are replayed by
+        the API instead of being applied twice.
 
-        return None
\ No newline at end of file
+        Args:
+            client_id (str, optional): Identifies the client for rate limiting.
+        """
+        idempotency_key = str(uuid.uuid4())
+        response = self.send_write(
+            "POST", f"{API_CONTROLLER_URL}/patients", idempotency_key, client_id
+        )
+        if conflict_reason(response) == CONFLICT_EXISTS:
+            response = self.send_write(
+                "PUT",
+                f"{API_CONTROLLER_URL}/patient/{self._id}",
+                idempotency_key + "-update",
+                client_id,
+            )
+        return response
@@ -0,0 +1,79 @@
+"""Background archiving of discharged patients."""
+
+import threading
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL_SECONDS
+from config import CHANGE_LOG_RETENTION_SECONDS
+
+
+class PatientArchiver(threading.Thread):
+    """
+    Background thread moving long-discharged patients to the archive.
+
+    Every interval it archives batches of patients discharged more than
+    ``older_than_days`` ago until a batch comes back short, committing each
+    batch separately so the writer connection is never held for long. It
+    also prunes the patient change log of entries older than
+    CHANGE_LOG_RETENTION_SECONDS.
+
+    Attributes:
+        patient_db (PatientDB): The patient database instance.
+        older_than_days (int): How long ago patients must have been discharged.
+        batch_size (int): The maximum number of patients moved per transaction.
+        interval (float): Seconds between archiving runs.
+        stopped (Event): Set to stop the thread.
+
+    Methods:
+        archive_once(): Archives every eligible patient, batch by batch.
+        run(): Archives periodically until stopped.
+        stop(): Asks the thread to stop.
+    """
+
+    def __init__(
+        self,
+        patient_db,
+        older_than_days=ARCHIVE_AFTER_DAYS,
+        batch_size=ARCHIVE_BATCH_SIZE,
+        interval=ARCHIVE_INTERVAL_SECONDS,
+    ):
+        super().__init__(name="patient-archiver", daemon=True)
+        self.patient_db = patient_db
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def archive_once(self):
+        """
+        Archives every eligible patient, one batch per transaction.
+
+        Returns:
+            int: The number of archived patients.
+        """
+        total = 0
+        while not self.stopped.is_set():
+            moved = self.patient_db.archive_discharged_patients(
+                self.older_than_days, self.batch_size
+            )
+            if not moved:
+                break
+            total += moved
+            if moved < self.batch_size:
+                break
+        return total
+
+    def run(self):
+        """
+        Archives periodically until stopped.
+        """
+        while not self.stopped.is_set():
+            archived = self.archive_once()
+            if archived:
+                print(f"Archived {archived} discharged patients")
+            self.patient_db.prune_changes(CHANGE_LOG_RETENTION_SECONDS)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        """
+        Asks the thread to stop after the current batch.
+        """
+        self.stopped.set()
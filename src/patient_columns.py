@@ -0,0 +1,37 @@
+"""Table and column names of the database, kept free of any database imports."""
+
+PATIENTS_TABLE_NAME = "patients"
+PATIENT_ID_COLUMN = "patient_id"
+PATIENT_NAME_COLUMN = "patient_name"
+PATIENT_AGE_COLUMN = "patient_age"
+PATIENT_GENDER_COLUMN = "patient_gender"
+PATIENT_CHECKIN_COLUMN = "patient_checkin"
+PATIENT_CHECKOUT_COLUMN = "patient_checkout"
+PATIENT_WARD_COLUMN = "patient_ward"
+PATIENT_ROOM_COLUMN = "patient_room"
+
+PATIENT_COLUMN_NAMES = [
+    PATIENT_ID_COLUMN,
+    PATIENT_NAME_COLUMN,
+    PATIENT_AGE_COLUMN,
+    PATIENT_GENDER_COLUMN,
+    PATIENT_ROOM_COLUMN,
+    PATIENT_WARD_COLUMN,
+    PATIENT_CHECKOUT_COLUMN,
+    PATIENT_CHECKIN_COLUMN,
+]
+
+ARCHIVED_PATIENTS_TABLE_NAME = "archived_patients"
+PATIENT_ARCHIVED_AT_COLUMN = "archived_at"
+PATIENT_ARCHIVE_REASON_COLUMN = "archive_reason"
+
+DOCTORS_TABLE_NAME = "doctors"
+DOCTOR_ID_COLUMN = "doctor_id"
+DOCTOR_NAME_COLUMN = "doctor_name"
+DOCTOR_PATIENT_COUNT_COLUMN = "patient_count"
+
+DOCTOR_PATIENTS_TABLE_NAME = "doctor_patients"
+
+PATIENT_CHANGES_TABLE_NAME = "patient_changes"
+CHANGE_SEQ_COLUMN = "change_seq"
+CHANGED_AT_COLUMN = "changed_at"
@@ -1,9 +1,41 @@
 """patient_db module"""
 
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql import operators
-from sqlalchemy import select
-from patient_db_config import PATIENTS_TABLE, ENGINE
+import datetime
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy import select, bindparam, func, String, Integer, table, column, literal_column
+from patient_db_config import PATIENTS_TABLE, ARCHIVED_PATIENTS_TABLE
+from patient_db_config import PATIENT_CHANGES_TABLE, PATIENT_CHANGES_TABLE_NAME
+from patient_db_config import DOCTORS_TABLE, DOCTOR_PATIENTS_TABLE
+from patient_db_config import PATIENT_ARCHIVED_AT_COLUMN, PATIENT_ARCHIVE_REASON_COLUMN
+from patient_db_config import get_engine, get_read_engine
+
+PATIENT_ID_PARAM = "b_patient_id"
+PATIENT_IDS_PARAM = "b_patient_ids"
+PATIENT_NAME_PATTERN_PARAM = "b_patient_name_pattern"
+CHECKOUT_CUTOFF_PARAM = "b_checkout_cutoff"
+BATCH_SIZE_PARAM = "b_batch_size"
+ARCHIVED_AT_PARAM = "b_archived_at"
+ARCHIVE_REASON_PARAM = "b_archive_reason"
+CHANGE_SEQ_PARAM = "b_change_seq"
+LAST_CHANGE_SEQ_PARAM = "b_last_change_seq"
+RETENTION_PARAM = "b_retention"
+UPDATE_VALUE_PARAM_PREFIX = "v_"
+# The number of IDs bound to a single IN list when selecting patients by ID.
+SELECT_BY_IDS_BATCH_SIZE = 500
+
+# Patients are listed in the order of the rowid of the patients table, which
+# is the order a plain table scan returns them in.
+ROWID = literal_column("rowid", Integer)
+
+# SQLite keeps the last sequence number of every AUTOINCREMENT table here, so
+# it is known even after the change log has been pruned empty.
+SQLITE_SEQUENCE = table("sqlite_sequence", column("name"), column("seq"))
+
+ARCHIVE_REASON_DISCHARGED = "discharged"
+ARCHIVE_REASON_DELETED = "deleted"
+# Only check-out times written as ISO dates ("2024-03-23 21:32:07") can be
+# compared with the cutoff, so only those patients are ever archived.
+ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
 
 
 class PatientDB:
@@ -13,20 +45,171 @@ class PatientDB:
     This class provides methods to interact with the patient database, including
     inserting, selecting, updating, and deleting patient records.
 
+    The statements are built once with bind parameters, so each call only binds
+    values and hits the engine's compiled cache instead of constructing and
+    compiling a new statement. Update statements are cached per set of
+    changed columns.
+
+    Reads go through a read-only connection (get_read_engine) and writes through
+    the writer connection (get_engine), so that with write-ahead logging readers
+    in any number of processes never contend with the writer.
+
+    Deleted patients, and patients discharged long enough ago, are moved to the
+    archived patients table. Reads only touch the active patients table unless
+    they ask to include archived patients.
+
     Attributes:
-        None
+        insert_stmt (Insert): The parameterized insert statement.
+        select_all_stmt (Select): The statement selecting every patient, in rowid order.
+        select_by_name_stmt (Select): The statement selecting patients by name pattern.
+        select_by_id_stmt (Select): The statement selecting a patient by ID.
+        delete_by_ids_stmt (Delete): The statement deleting patients by ID.
+        archive_candidates_stmt (Select): The statement selecting a batch of
+        patients discharged before a cutoff.
+        archive_by_ids_stmt (Insert): The statement copying patients to the archive.
+        unassign_by_ids_stmt (Delete): The statement removing the doctor
+        assignments of patients.
+        decrement_counts_by_ids_stmt (Update): The statement decrementing the
+        patient counts of the doctors of patients.
+        select_all_archived_stmt (Select): The statement selecting every archived patient.
+        select_archived_by_name_stmt (Select): The statement selecting archived
+        patients by name pattern.
+        select_archived_by_id_stmt (Select): The statement selecting the latest
+        archived copy of a patient by ID.
+        select_all_rows_stmt (Select): The statement selecting every patient
+        with its rowid, in rowid order.
+        select_rows_by_ids_stmt (Select): The statement selecting patients by
+        ID, with their rowids.
+        last_change_stmt (Select): The statement selecting the last change log
+        sequence number.
+        first_change_stmt (Select): The statement selecting the oldest change
+        log sequence number still kept.
+        select_changes_stmt (Select): The statement selecting the patient IDs
+        of a range of changes.
+        prune_changes_stmt (Delete): The statement deleting old changes.
+        update_stmts (dict): Frozen set of column names to the cached update statement.
 
     Methods:
+        update_stmt_for: Returns the cached update statement for a set of columns.
         insert_patient: Inserts a new patient record into the database.
+        insert_patients: Inserts several patient records in one transaction.
         row_to_dict: Converts a database row to a dictionary.
+        fetch_dicts: Runs select statements and returns their rows as dictionaries.
         select_all_patients: Retrieves all patient records from the database.
         select_patient: Retrieves a specific patient record from the database.
         update_patient: Updates a specific patient record in the database.
-        delete_patient: Deletes a specific patient record from the database.
+        move_to_archive: Moves patient records to the archived patients table.
+        archive_discharged_patients: Archives a batch of long-discharged patients.
+        delete_patient: Moves a specific patient record to the archive.
+        select_changes: Retrieves the IDs of the patients changed since a change.
+        select_patient_rows: Retrieves active patient records with their rowids.
+        prune_changes: Deletes old entries of the patient change log.
     """
 
     def __init__(self):
-        pass
+        by_id = PATIENTS_TABLE.c.patient_id == bindparam(PATIENT_ID_PARAM)
+        self.insert_stmt = PATIENTS_TABLE.insert()
+        self.select_all_stmt = select(PATIENTS_TABLE).order_by(ROWID)
+        self.select_by_name_stmt = select(PATIENTS_TABLE).where(
+            PATIENTS_TABLE.c.patient_name.like(bindparam(PATIENT_NAME_PATTERN_PARAM))
+        )
+        self.select_by_id_stmt = select(PATIENTS_TABLE).where(by_id)
+        by_ids = PATIENTS_TABLE.c.patient_id.in_(
+            bindparam(PATIENT_IDS_PARAM, expanding=True)
+        )
+        self.delete_by_ids_stmt = PATIENTS_TABLE.delete().where(by_ids)
+        self.select_all_rows_stmt = select(ROWID, *PATIENTS_TABLE.columns).order_by(ROWID)
+        self.select_rows_by_ids_stmt = select(ROWID, *PATIENTS_TABLE.columns).where(by_ids)
+        changes = PATIENT_CHANGES_TABLE.c
+        self.last_change_stmt = select(SQLITE_SEQUENCE.c.seq).where(
+            SQLITE_SEQUENCE.c.name == PATIENT_CHANGES_TABLE_NAME
+        )
+        self.first_change_stmt = select(func.min(changes.change_seq))
+        self.select_changes_stmt = (
+            select(changes.patient_id)
+            .where(changes.change_seq > bindparam(CHANGE_SEQ_PARAM))
+            .where(changes.change_seq <= bindparam(LAST_CHANGE_SEQ_PARAM))
+            .order_by(changes.change_seq)
+        )
+        self.prune_changes_stmt = PATIENT_CHANGES_TABLE.delete().where(
+            changes.changed_at < func.datetime("now", bindparam(RETENTION_PARAM))
+        )
+        checkout = PATIENTS_TABLE.c.patient_checkout
+        self.archive_candidates_stmt = (
+            select(PATIENTS_TABLE.c.patient_id)
+            .where(checkout.op("GLOB")(ISO_DATE_GLOB))
+            .where(checkout < bindparam(CHECKOUT_CUTOFF_PARAM))
+            .limit(bindparam(BATCH_SIZE_PARAM))
+        )
+        self.archive_by_ids_stmt = ARCHIVED_PATIENTS_TABLE.insert().from_select(
+            [column.name for column in PATIENTS_TABLE.columns]
+            + [PATIENT_ARCHIVED_AT_COLUMN, PATIENT_ARCHIVE_REASON_COLUMN],
+            select(
+                *PATIENTS_TABLE.columns,
+                bindparam(ARCHIVED_AT_PARAM, type_=String),
+                bindparam(ARCHIVE_REASON_PARAM, type_=String),
+            ).where(by_ids),
+        )
+        assignments = DOCTOR_PATIENTS_TABLE.c
+        assigned_ids = assignments.patient_id.in_(
+            bindparam(PATIENT_IDS_PARAM, expanding=True)
+        )
+        self.unassign_by_ids_stmt = DOCTOR_PATIENTS_TABLE.delete().where(assigned_ids)
+        self.decrement_counts_by_ids_stmt = (
+            DOCTORS_TABLE.update()
+            .where(
+                DOCTORS_TABLE.c.doctor_id.in_(
+                    select(assignments.doctor_id).where(assigned_ids)
+                )
+            )
+            .values(
+                patient_count=DOCTORS_TABLE.c.patient_count
+                - select(func.count())
+                .where(assignments.doctor_id == DOCTORS_TABLE.c.doctor_id)
+                .where(assigned_ids)
+                .scalar_subquery()
+            )
+        )
+        archived = ARCHIVED_PATIENTS_TABLE.c
+        self.select_all_archived_stmt = select(ARCHIVED_PATIENTS_TABLE)
+        self.select_archived_by_name_stmt = select(ARCHIVED_PATIENTS_TABLE).where(
+            archived.patient_name.like(bindparam(PATIENT_NAME_PATTERN_PARAM))
+        )
+        # A patient may be archived more than once, so the latest copy is read.
+        self.select_archived_by_id_stmt = (
+            select(ARCHIVED_PATIENTS_TABLE)
+            .where(archived.patient_id == bindparam(PATIENT_ID_PARAM))
+            .order_by(archived.archived_at.desc(), ROWID.desc())
+            .limit(1)
+        )
+        self.update_stmts = {}
+
+    def update_stmt_for(self, columns):
+        """
+        Returns the update statement setting the given columns, building and
+        caching it the first time that set of columns is seen.
+
+        Args:
+            columns (iterable): The names of the columns to update.
+
+        Returns:
+            Update: The parameterized update statement.
+        """
+        key = frozenset(columns)
+        stmt = self.update_stmts.get(key)
+        if stmt is None:
+            stmt = (
+                PATIENTS_TABLE.update()
+                .where(PATIENTS_TABLE.c.patient_id == bindparam(PATIENT_ID_PARAM))
+                .values(
+                    {
+                        column: bindparam(UPDATE_VALUE_PARAM_PREFIX + column)
+                        for column in sorted(key)
+                    }
+                )
+            )
+            self.update_stmts[key] = stmt
+        return stmt
 
     def insert_patient(self, request_body):
         """
@@ -36,20 +219,46 @@ class PatientDB:
             request_body (dict): The request body containing the patient information.
 
         Returns:
-            str: The primary key of the inserted patient record, or None if an error occurred.
+            tuple: The primary key of the inserted patient record, an empty tuple
+            if a patient with the same ID already exists, or None if an error occurred.
         """
         try:
-            conn = ENGINE.connect()
-            stmt = PATIENTS_TABLE.insert().values(**request_body)
-            result = conn.execute(stmt)
+            conn = get_engine().connect()
+            result = conn.execute(self.insert_stmt, request_body)
             conn.commit()
             return result.inserted_primary_key
+        except IntegrityError:
+            return ()
         except SQLAlchemyError as e:
             print("Error occurred while inserting the patient", e)
             return None
         finally:
             conn.close()
 
+    def insert_patients(self, request_bodies):
+        """
+        Inserts several patient records into the database in one transaction.
+
+        Args:
+            request_bodies (list): The list of dicts containing the patient information.
+
+        Returns:
+            int: The number of inserted patient records, 0 if a patient with one
+            of the IDs already exists, or None if an error occurred.
+        """
+        try:
+            conn = get_engine().connect()
+            result = conn.execute(self.insert_stmt, request_bodies)
+            conn.commit()
+            return result.rowcount
+        except IntegrityError:
+            return 0
+        except SQLAlchemyError as e:
+            print("Error occurred while inserting the patients", e)
+            return None
+        finally:
+            conn.close()
+
     def row_to_dict(self, row_keys, row_values):
         """
         Converts a database row to a dictionary.
@@ -63,75 +272,103 @@ class PatientDB:
         """
         return dict(zip(row_keys, row_values))
 
-    def select_all_patients(self):
+    def fetch_dicts(self, conn, stmts, params=None):
+        """
+        Runs select statements and returns all their rows as dictionaries.
+
+        Args:
+            conn (Connection): The connection to run the statements on.
+            stmts (list): The select statements to run, in order.
+            params (dict, optional): The bind parameter values.
+
+        Returns:
+            list: A dictionary for every selected row.
+        """
+        rows = []
+        for stmt in stmts:
+            result = conn.execute(stmt, params)
+            keys = result.keys()
+            rows.extend(dict(zip(keys, row)) for row in result.fetchall())
+        return rows
+
+    def select_all_patients(self, include_archived=False):
         """
         Retrieves all patient records from the database.
 
+        Args:
+            include_archived (bool, optional): Whether to include archived patients.
+
         Returns:
             list: A list of dictionaries representing the patient records,
             or None if an error occurred.
         """
+        stmts = [self.select_all_stmt]
+        if include_archived:
+            stmts.append(self.select_all_archived_stmt)
         try:
-            conn = ENGINE.connect()
-            stmt = select(PATIENTS_TABLE)
-            result = conn.execute(stmt)
-            keys = result.keys()
-            rows = result.fetchall()
-            patients = [dict(zip(keys, row)) for row in rows]
-            return patients
+            conn = get_read_engine().connect()
+            return self.fetch_dicts(conn, stmts)
         except SQLAlchemyError as e:
             print("Error occurred while selecting all patients", e)
             return None
         finally:
             conn.close()
 
-    def fetch_patient_id_by_name(self, patient_name):
+    def fetch_patient_id_by_name(self, patient_name, include_archived=False):
         """
         Retrieves the patient ID by patient name.
 
         Args:
             patient_name (str): The name of the patient.
+            include_archived (bool, optional): Whether to include archived patients.
 
         Returns:
             int: The patient ID, or None if an error occurred.
         """
+        stmts = [self.select_by_name_stmt]
+        if include_archived:
+            stmts.append(self.select_archived_by_name_stmt)
         try:
-            conn = ENGINE.connect()
-            stmt = PATIENTS_TABLE.select().where(
-                operators.like_op(
-                    PATIENTS_TABLE.c.patient_name,
-                    "%"+patient_name+"%"
-                )
+            conn = get_read_engine().connect()
+            return self.fetch_dicts(
+                conn, stmts, {PATIENT_NAME_PATTERN_PARAM: "%" + patient_name + "%"}
             )
-            result = conn.execute(stmt)
-            keys = result.keys()
-            rows = result.fetchall()
-            patients = [dict(zip(keys, row)) for row in rows]
-            return patients
         except SQLAlchemyError as e:
             print("Error occurred while fetching patient ID by name", e)
             return None
         finally:
             conn.close()
 
-    def select_patient(self, patient_id):
+    def select_patient(self, patient_id, include_archived=False):
         """
         Retrieves a specific patient record from the database.
 
         Args:
             patient_id (int): The ID of the patient.
+            include_archived (bool, optional): Whether to fall back to the archive
+            when the patient is not active.
 
         Returns:
-            dict: A dictionary representing the patient record, or None if an error occurred.
+            dict: A dictionary representing the patient record, an empty dictionary
+            if there is no such patient, or None if an error occurred.
         """
         try:
-            conn = ENGINE.connect()
-            stmt = PATIENTS_TABLE.select().where(
-                PATIENTS_TABLE.c.patient_id == patient_id
+            conn = get_read_engine().connect()
+            result = conn.execute(
+                self.select_by_id_stmt, {PATIENT_ID_PARAM: patient_id}
             )
-            result = conn.execute(stmt)
             keys = result.keys()
             values = result.fetchone()
+            if values is None and include_archived:
+                archived = self.fetch_dicts(
+                    conn,
+                    [self.select_archived_by_id_stmt],
+                    {PATIENT_ID_PARAM: patient_id},
+                )
+                if archived:
+                    return archived[0]
+            if values is None:
+                return {}
             patient = self.row_to_dict(keys, values)
             return patient
         except SQLAlchemyError as e:
@@ -152,13 +389,13 @@ class PatientDB:
             int: The number of affected rows, or None if an error occurred.
         """
         try:
-            conn = ENGINE.connect()
-            stmt = (
-                PATIENTS_TABLE.update()
-                .where(PATIENTS_TABLE.c.patient_id == patient_id)
-                .values(**update_dict)
-            )
-            result = conn.execute(stmt)
+            conn = get_engine().connect()
+            params = {
+                UPDATE_VALUE_PARAM_PREFIX + column: value
+                for column, value in update_dict.items()
+            }
+            params[PATIENT_ID_PARAM] = patient_id
+            result = conn.execute(self.update_stmt_for(update_dict), params)
             conn.commit()
             return result.rowcount
         except SQLAlchemyError as e:
@@ -167,9 +404,69 @@ class PatientDB:
         finally:
             conn.close()
 
+    def move_to_archive(self, conn, patient_ids, reason):
+        """
+        Copies patient records to the archive and removes them, and their doctor
+        assignments, from the active tables, on the given connection and inside
+        its transaction.
+
+        Args:
+            conn (Connection): The writer connection.
+            patient_ids (list): The IDs of the patients to move.
+            reason (str): Why the patients are archived.
+
+        Returns:
+            int: The number of moved patient records.
+        """
+        if not patient_ids:
+            return 0
+        conn.execute(
+            self.archive_by_ids_stmt,
+            {
+                PATIENT_IDS_PARAM: patient_ids,
+                ARCHIVED_AT_PARAM: str(datetime.datetime.now()),
+                ARCHIVE_REASON_PARAM: reason,
+            },
+        )
+        params = {PATIENT_IDS_PARAM: patient_ids}
+        conn.execute(self.decrement_counts_by_ids_stmt, params)
+        conn.execute(self.unassign_by_ids_stmt, params)
+        result = conn.execute(self.delete_by_ids_stmt, params)
+        return result.rowcount
+
+    def archive_discharged_patients(self, older_than_days, batch_size):
+        """
+        Moves one batch of patients discharged more than the given number of
+        days ago to the archive, in a single transaction.
+
+        Args:
+            older_than_days (int): How long ago patients must have been discharged.
+            batch_size (int): The maximum number of patients to move.
+
+        Returns:
+            int: The number of archived patient records, or None if an error occurred.
+        """
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+        try:
+            conn = get_engine().connect()
+            result = conn.execute(
+                self.archive_candidates_stmt,
+                {CHECKOUT_CUTOFF_PARAM: str(cutoff), BATCH_SIZE_PARAM: batch_size},
+            )
+            patient_ids = [row[0] for row in result.fetchall()]
+            moved = self.move_to_archive(conn, patient_ids, ARCHIVE_REASON_DISCHARGED)
+            conn.commit()
+            return moved
+        except SQLAlchemyError as e:
+            print("Error occurred while archiving discharged patients", e)
+            return None
+        finally:
+            conn.close()
+
     def delete_patient(self, patient_id):
         """
-        Deletes a specific patient record from the database.
+        Deletes a specific patient record from the active patients table. The
+        record is kept in the archive rather than destroyed.
 
         Args:
             patient_id (int): The ID of the patient.
@@ -178,16 +475,109 @@ class PatientDB:
             int: The number of affected rows, or None if an error occurred.
         """
         try:
-            conn = ENGINE.connect()
-            stmt = PATIENTS_TABLE.delete().where(
-                PATIENTS_TABLE.c.patient_id == patient_id
+            conn = get_engine().connect()
+            deleted = self.move_to_archive(conn, [patient_id], ARCHIVE_REASON_DELETED)
+            conn.commit()
+            return deleted
+        except SQLAlchemyError as e:
+            print("Error occurred while deleting the patient", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_changes(self, after_seq):
+        """
+        Retrieves the IDs of the patients inserted, updated or deleted after a
+        given change, from the change log kept by the patients table triggers.
+
+        Args:
+            after_seq (int): The sequence number of the last change already
+            seen, or None if none was seen yet.
+
+        Returns:
+            tuple: The sequence number of the last change, and the distinct IDs of
+            the changed patients, or None in place of the IDs when after_seq is
+            None or the changes after it were already pruned. None if an error
+            occurred.
+        """
+        try:
+            conn = get_read_engine().connect()
+            last_seq = conn.execute(self.last_change_stmt).scalar() or 0
+            if after_seq is None:
+                return last_seq, None
+            first_seq = conn.execute(self.first_change_stmt).scalar()
+            if first_seq is None:
+                first_seq = last_seq + 1
+            if first_seq > after_seq + 1:
+                return last_seq, None
+            result = conn.execute(
+                self.select_changes_stmt,
+                {CHANGE_SEQ_PARAM: after_seq, LAST_CHANGE_SEQ_PARAM: last_seq},
             )
-            result = conn.execute(stmt)
+            return last_seq, list(dict.fromkeys(row[0] for row in result))
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting the patient changes", e)
+            return None
+        finally:
+            conn.close()
+
+    def select_patient_rows(self, patient_ids=None):
+        """
+        Retrieves active patient records with their rowids, which give the
+        order select_all_patients lists the patients in.
+
+        Args:
+            patient_ids (list, optional): The IDs of the patients, or None for
+            every active patient.
+
+        Returns:
+            list: A (rowid, patient dictionary) tuple for every selected active
+            patient, in rowid order when every patient is selected, or None if
+            an error occurred.
+        """
+        if patient_ids is None:
+            batches = [(self.select_all_rows_stmt, None)]
+        else:
+            batches = [
+                (
+                    self.select_rows_by_ids_stmt,
+                    {PATIENT_IDS_PARAM: patient_ids[start:start + SELECT_BY_IDS_BATCH_SIZE]},
+                )
+                for start in range(0, len(patient_ids), SELECT_BY_IDS_BATCH_SIZE)
+            ]
+        try:
+            conn = get_read_engine().connect()
+            rows = []
+            for stmt, params in batches:
+                result = conn.execute(stmt, params)
+                keys = list(result.keys())[1:]
+                rows.extend((row[0], dict(zip(keys, row[1:]))) for row in result)
+            return rows
+        except SQLAlchemyError as e:
+            print("Error occurred while selecting the patient rows", e)
+            return None
+        finally:
+            conn.close()
+
+    def prune_changes(self, retention_seconds):
+        """
+        Deletes the change log entries older than the given retention.
 
+        Args:
+            retention_seconds (int): How long changes are kept.
+
+        Returns:
+            int: The number of deleted entries, or None if an error occurred.
+        """
+        try:
+            conn = get_engine().connect()
+            result = conn.execute(
+                self.prune_changes_stmt, {RETENTION_PARAM: f"-{retention_seconds} seconds"}
+            )
             conn.commit()
             return result.rowcount
         except SQLAlchemyError as e:
-            print("Error occurred while deleting the patient", e)
+            print("Error occurred while pruning the patient changes", e)
             return None
         finally:
             conn.close()
@@ -1,47 +1,196 @@
-"""All sqlalchemy related config goes here, including the database schema definition."""
+"""
+All sqlalchemy related config goes here, including the database schema definition.
 
-import sqlite3
-from sqlalchemy import create_engine
-from sqlalchemy import Table, Column, Integer, String, MetaData
+Importing this module has no side effects: the engines are created on first
+use and the schema is only created by an explicit call to init_schema().
+"""
 
-DB_FILE_PATH = "patient.db"
-
-CONN = sqlite3.connect(DB_FILE_PATH)
-ENGINE = create_engine("sqlite:///" + DB_FILE_PATH, echo=True)
-METADATA = MetaData()
-
-PATIENTS_TABLE_NAME = "patients"
-PATIENT_ID_COLUMN = "patient_id"
-PATIENT_NAME_COLUMN = "patient_name"
-PATIENT_AGE_COLUMN = "patient_age"
-PATIENT_GENDER_COLUMN = "patient_gender"
-PATIENT_CHECKIN_COLUMN = "patient_checkin"
-PATIENT_CHECKOUT_COLUMN = "patient_checkout"
-PATIENT_WARD_COLUMN = "patient_ward"
-PATIENT_ROOM_COLUMN = "patient_room"
-
-PATIENT_COLUMN_NAMES = [
+import os
+from functools import lru_cache
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy import Table, Column, Index, Integer, String, MetaData
+from config import GENDERS, WARD_NUMBERS, ROOM_NUMBERS, PATIENT_AGE_RANGE, DOCTORS
+from patient_columns import (  # pylint: disable=unused-import
+    PATIENTS_TABLE_NAME,
     PATIENT_ID_COLUMN,
     PATIENT_NAME_COLUMN,
     PATIENT_AGE_COLUMN,
     PATIENT_GENDER_COLUMN,
-    PATIENT_ROOM_COLUMN,
-    PATIENT_WARD_COLUMN,
-    PATIENT_CHECKOUT_COLUMN,
     PATIENT_CHECKIN_COLUMN,
-]
+    PATIENT_CHECKOUT_COLUMN,
+    PATIENT_WARD_COLUMN,
+    PATIENT_ROOM_COLUMN,
+    PATIENT_COLUMN_NAMES,
+    ARCHIVED_PATIENTS_TABLE_NAME,
+    PATIENT_ARCHIVED_AT_COLUMN,
+    PATIENT_ARCHIVE_REASON_COLUMN,
+    DOCTORS_TABLE_NAME,
+    DOCTOR_ID_COLUMN,
+    DOCTOR_NAME_COLUMN,
+    DOCTOR_PATIENT_COUNT_COLUMN,
+    DOCTOR_PATIENTS_TABLE_NAME,
+    PATIENT_CHANGES_TABLE_NAME,
+    CHANGE_SEQ_COLUMN,
+    CHANGED_AT_COLUMN,
+)
 
-PATIENTS_TABLE = Table(
-    PATIENTS_TABLE_NAME,
+DB_FILE_PATH = os.environ.get("PATIENT_DB_PATH", "patient.db")
+DB_ECHO = os.environ.get("PATIENT_DB_ECHO", "1") == "1"
+
+METADATA = MetaData()
+
+
+def enable_wal(dbapi_connection, _connection_record):
+    """
+    Switches the database to write-ahead logging so that read-only connections
+    in other processes never block on, or get blocked by, the writer.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """
+    Returns the read-write engine, creating it on first use.
+
+    Returns:
+        Engine: The engine used for every write.
+    """
+    engine = create_engine("sqlite:///" + DB_FILE_PATH, echo=DB_ECHO)
+    event.listen(engine, "connect", enable_wal)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_read_engine():
+    """
+    Returns the read-only engine, creating it on first use.
+
+    Returns:
+        Engine: The engine used for every read.
+    """
+    return create_engine(
+        "sqlite:///file:" + DB_FILE_PATH + "?mode=ro&uri=true", echo=DB_ECHO
+    )
+
+
+def init_schema():
+    """
+    Creates the database tables and change log triggers that do not exist yet,
+    and adds the doctors from config.DOCTORS when the doctors table is empty.
+    """
+    engine = get_engine()
+    METADATA.create_all(engine)
+    with engine.begin() as conn:
+        for name, definition in PATIENT_CHANGE_TRIGGERS.items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {definition}")
+        if conn.execute(select(func.count()).select_from(DOCTORS_TABLE)).scalar():
+            return
+        conn.execute(
+            DOCTORS_TABLE.insert(),
+            [{DOCTOR_NAME_COLUMN: name, DOCTOR_PATIENT_COUNT_COLUMN: 0} for name in DOCTORS],
+        )
+
+
+def patient_table_columns(primary_key=True):
+    """
+    Builds the columns shared by the patients and archived patients tables.
+
+    Args:
+        primary_key (bool): Whether the patient ID is the primary key.
+
+    Returns:
+        list: New Column instances for a patient table.
+    """
+    return [
+        Column(
+            PATIENT_ID_COLUMN,
+            String,
+            primary_key=primary_key,
+            index=not primary_key,
+            info={"min_length": 1},
+        ),
+        Column(PATIENT_NAME_COLUMN, String, info={"min_length": 1}),
+        Column(PATIENT_AGE_COLUMN, Integer, info={"range": PATIENT_AGE_RANGE}),
+        Column(PATIENT_GENDER_COLUMN, String, info={"choices": GENDERS}),
+        Column(PATIENT_CHECKIN_COLUMN, String),
+        Column(PATIENT_CHECKOUT_COLUMN, String, info={"nullable": True}),
+        Column(PATIENT_WARD_COLUMN, Integer, info={"choices": WARD_NUMBERS}),
+        Column(
+            PATIENT_ROOM_COLUMN,
+            Integer,
+            info={"choices": [int(room) for rooms in ROOM_NUMBERS.values() for room in rooms]},
+        ),
+    ]
+
+
+PATIENTS_TABLE = Table(PATIENTS_TABLE_NAME, METADATA, *patient_table_columns())
+
+Index("ix_patients_patient_checkout", PATIENTS_TABLE.c.patient_checkout)
+
+# Discharged patients are moved here by the archiver, and deleted patients by
+# delete_patient, so that the hot patients table only holds active admissions.
+ARCHIVED_PATIENTS_TABLE = Table(
+    ARCHIVED_PATIENTS_TABLE_NAME,
+    METADATA,
+    *patient_table_columns(primary_key=False),
+    Column(PATIENT_ARCHIVED_AT_COLUMN, String),
+    Column(PATIENT_ARCHIVE_REASON_COLUMN, String),
+)
+
+# patient_count is kept up to date by every assignment change, so the number of
+# patients of a doctor never needs a scan of the assignments.
+DOCTORS_TABLE = Table(
+    DOCTORS_TABLE_NAME,
     METADATA,
+    Column(DOCTOR_ID_COLUMN, Integer, primary_key=True),
+    Column(DOCTOR_NAME_COLUMN, String, nullable=False),
+    Column(DOCTOR_PATIENT_COUNT_COLUMN, Integer, nullable=False, default=0),
+)
+
+# The (doctor_id, patient_id) primary key serves lookups by doctor, in patient ID
+# order for keyset pagination, and the second index serves lookups by patient.
+DOCTOR_PATIENTS_TABLE = Table(
+    DOCTOR_PATIENTS_TABLE_NAME,
+    METADATA,
+    Column(DOCTOR_ID_COLUMN, Integer, primary_key=True),
     Column(PATIENT_ID_COLUMN, String, primary_key=True),
-    Column(PATIENT_NAME_COLUMN, String),
-    Column(PATIENT_AGE_COLUMN, Integer),
-    Column(PATIENT_GENDER_COLUMN, String),
-    Column(PATIENT_CHECKIN_COLUMN, String),
-    Column(PATIENT_CHECKOUT_COLUMN, String),
-    Column(PATIENT_WARD_COLUMN, Integer),
-    Column(PATIENT_ROOM_COLUMN, Integer),
 )
 
-METADATA.create_all(ENGINE)
+Index(
+    "ix_doctor_patients_patient_id_doctor_id",
+    DOCTOR_PATIENTS_TABLE.c.patient_id,
+    DOCTOR_PATIENTS_TABLE.c.doctor_id,
+)
+
+# Every insert, update and delete of a patient appends its ID to the change log,
+# through the triggers below, so that readers in any process can find the rows
+# that changed since they last looked without scanning the patients table.
+PATIENT_CHANGES_TABLE = Table(
+    PATIENT_CHANGES_TABLE_NAME,
+    METADATA,
+    Column(CHANGE_SEQ_COLUMN, Integer, primary_key=True),
+    Column(PATIENT_ID_COLUMN, String, nullable=False),
+    Column(CHANGED_AT_COLUMN, String, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+Index("ix_patient_changes_changed_at", PATIENT_CHANGES_TABLE.c.changed_at)
+
+LOG_CHANGE = (
+    f"INSERT INTO {PATIENT_CHANGES_TABLE_NAME} ({PATIENT_ID_COLUMN}, {CHANGED_AT_COLUMN}) "
+    f"SELECT {{row}}.{PATIENT_ID_COLUMN}, datetime('now')"
+)
+
+PATIENT_CHANGE_TRIGGERS = {
+    "log_patient_insert": f"AFTER INSERT ON {PATIENTS_TABLE_NAME} "
+    f"BEGIN {LOG_CHANGE.format(row='NEW')}; END",
+    "log_patient_update": f"AFTER UPDATE ON {PATIENTS_TABLE_NAME} "
+    f"BEGIN {LOG_CHANGE.format(row='NEW')}; "
+    f"{LOG_CHANGE.format(row='OLD')} "
+    f"WHERE OLD.{PATIENT_ID_COLUMN} IS NOT NEW.{PATIENT_ID_COLUMN}; END",
+    "log_patient_delete": f"AFTER DELETE ON {PATIENTS_TABLE_NAME} "
+    f"BEGIN {LOG_CHANGE.format(row='OLD')}; END",
+}
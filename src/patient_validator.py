@@ -0,0 +1,289 @@
+"""Request validation for patient payloads, compiled from the table schema."""
+
+import re
+from config import ROOM_NUMBERS
+from patient_db_config import PATIENTS_TABLE
+from patient_db_config import PATIENT_ID_COLUMN
+from patient_db_config import PATIENT_WARD_COLUMN
+from patient_db_config import PATIENT_ROOM_COLUMN
+
+INTEGER_PATTERN = re.compile(r"-?[0-9]+")
+
+
+def parse_integer(value):
+    """
+    Parses an integer field value, which may be sent as a string of ASCII digits.
+
+    Args:
+        value: The value from the request body.
+
+    Returns:
+        int: The parsed integer, or None if the value is not an integer.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and INTEGER_PATTERN.fullmatch(value.strip()):
+        return int(value)
+    return None
+
+
+class PatientValidator:
+    """
+    Validates patient request bodies against the PATIENTS_TABLE definition.
+
+    The checks for every column are compiled once, when the validator is
+    created, from the column type and the constraints declared in the
+    column ``info`` dict (``min_length``, ``range``, ``choices`` and
+    ``nullable``). Validating a payload is then a dictionary walk with no
+    database access. Integer fields sent as strings are replaced in the body
+    by their parsed value, so the database always receives integers.
+
+    Attributes:
+        field_parsers (dict): Column name to the compiled type check and parser.
+        field_checks (dict): Column name to the list of compiled check functions.
+
+    Methods:
+        validate_create(request_body): Validates a payload for a new patient.
+        validate_update(patient_id, request_body): Validates a partial update payload.
+        validate_bulk(request_body): Validates a list of payloads for new patients.
+    """
+
+    def __init__(self, table=PATIENTS_TABLE):
+        self.field_parsers = {
+            column.name: self.type_check(
+                column.type.python_type, column.info.get("nullable", False)
+            )
+            for column in table.columns
+        }
+        self.field_checks = {
+            column.name: self.compile_column(column) for column in table.columns
+        }
+
+    def compile_column(self, column):
+        """
+        Builds the list of check functions for a single column, run on values
+        that already passed the type check.
+
+        Args:
+            column (Column): The sqlalchemy column to compile.
+
+        Returns:
+            list: Functions taking a value and returning an error message or None.
+        """
+        info = column.info
+        checks = []
+        if "min_length" in info:
+            checks.append(self.min_length_check(info["min_length"]))
+        if "range" in info:
+            checks.append(self.range_check(*info["range"]))
+        if "choices" in info:
+            checks.append(self.choices_check(info["choices"]))
+        return checks
+
+    def type_check(self, python_type, nullable):
+        """
+        Builds a check for the python type of a value, which also parses it.
+
+        Integer columns also accept strings of ASCII digits, since the
+        front-end and the payload templates send ward and room numbers as
+        strings.
+
+        Args:
+            python_type (type): The expected python type.
+            nullable (bool): Whether None is an accepted value.
+
+        Returns:
+            function: The compiled check, returning the parsed value and an
+            error message or None.
+        """
+
+        def check(value):
+            if value is None:
+                return None, None if nullable else "must not be null"
+            if python_type is int:
+                parsed = parse_integer(value)
+                return parsed, None if parsed is not None else "must be an integer"
+            if not isinstance(value, python_type):
+                return value, f"must be of type {python_type.__name__}"
+            return value, None
+
+        return check
+
+    def min_length_check(self, min_length):
+        """
+        Builds a check for the minimum length of a string value.
+
+        Args:
+            min_length (int): The minimum accepted length.
+
+        Returns:
+            function: The compiled check.
+        """
+
+        def check(value):
+            if value is not None and len(value.strip()) < min_length:
+                return f"must be at least {min_length} characters long"
+            return None
+
+        return check
+
+    def range_check(self, minimum, maximum):
+        """
+        Builds a check for an inclusive numeric range.
+
+        Args:
+            minimum (int): The lowest accepted value.
+            maximum (int): The highest accepted value.
+
+        Returns:
+            function: The compiled check.
+        """
+
+        def check(value):
+            if value is not None and not minimum <= value <= maximum:
+                return f"must be between {minimum} and {maximum}"
+            return None
+
+        return check
+
+    def choices_check(self, choices):
+        """
+        Builds a check that a value is one of the allowed choices.
+
+        Args:
+            choices (list): The allowed values.
+
+        Returns:
+            function: The compiled check.
+        """
+        allowed = frozenset(choices)
+
+        def check(value):
+            if value is None:
+                return None
+            if value not in allowed:
+                return f"must be one of {sorted(allowed)}"
+            return None
+
+        return check
+
+    def validate_fields(self, request_body, required):
+        """
+        Runs the compiled checks over a request body.
+
+        Args:
+            request_body (dict): The request body to validate.
+            required (bool): Whether every column must be present.
+
+        Returns:
+            dict: Field name to error message, empty if the body is valid.
+        """
+        if not isinstance(request_body, dict):
+            return {"body": "must be a JSON object"}
+        errors = {
+            field: "unknown field"
+            for field in request_body
+            if field not in self.field_checks
+        }
+        for field, parse in self.field_parsers.items():
+            if field not in request_body:
+                if required:
+                    errors[field] = "missing required field"
+                continue
+            value, error = parse(request_body[field])
+            if error is None:
+                request_body[field] = value
+                for check in self.field_checks[field]:
+                    error = check(value)
+                    if error is not None:
+                        break
+            if error is not None:
+                errors[field] = error
+        if not errors:
+            errors.update(self.validate_room_in_ward(request_body))
+        return errors
+
+    def validate_room_in_ward(self, request_body):
+        """
+        Checks that the room is one of the rooms of the ward in ROOM_NUMBERS.
+        Ward and room must be given together, so that an update cannot move a
+        patient to a ward without also moving them to one of its rooms.
+
+        Args:
+            request_body (dict): An already type-checked request body.
+
+        Returns:
+            dict: Field name to error message, empty if the body is valid.
+        """
+        has_ward = PATIENT_WARD_COLUMN in request_body
+        has_room = PATIENT_ROOM_COLUMN in request_body
+        if has_ward != has_room:
+            given, missing = (
+                (PATIENT_WARD_COLUMN, PATIENT_ROOM_COLUMN)
+                if has_ward
+                else (PATIENT_ROOM_COLUMN, PATIENT_WARD_COLUMN)
+            )
+            return {missing: f"must be given together with {given}"}
+        if not has_ward:
+            return {}
+        ward = request_body.get(PATIENT_WARD_COLUMN)
+        room = request_body.get(PATIENT_ROOM_COLUMN)
+        if str(room) not in ROOM_NUMBERS.get(ward, []):
+            return {PATIENT_ROOM_COLUMN: f"is not allocated in the ward {ward}"}
+        return {}
+
+    def validate_create(self, request_body):
+        """
+        Validates the request body for creating a patient.
+
+        Args:
+            request_body (dict): The request body containing patient data.
+
+        Returns:
+            dict: Field name to error message, empty if the body is valid.
+        """
+        return self.validate_fields(request_body, required=True)
+
+    def validate_update(self, patient_id, request_body):
+        """
+        Validates the request body for updating a patient.
+
+        Only the given fields are checked. The patient ID may be repeated in the
+        body, as the front-end does, but it cannot be changed.
+
+        Args:
+            patient_id (str): The ID of the patient being updated.
+            request_body (dict): The request body containing the changed fields.
+
+        Returns:
+            dict: Field name to error message, empty if the body is valid.
+        """
+        errors = self.validate_fields(request_body, required=False)
+        if errors:
+            return errors
+        if not request_body:
+            return {"body": "must contain at least one field"}
+        if request_body.get(PATIENT_ID_COLUMN, patient_id) != patient_id:
+            return {PATIENT_ID_COLUMN: "cannot be changed"}
+        return {}
+
+    def validate_bulk(self, request_body):
+        """
+        Validates a list of request bodies for creating patients.
+
+        Args:
+            request_body (list): The list of patient payloads.
+
+        Returns:
+            dict: Payload index to its field errors, empty if every payload is valid.
+        """
+        if not isinstance(request_body, list) or not request_body:
+            return {"body": "must be a non-empty JSON array"}
+        errors = {}
+        for index, patient in enumerate(request_body):
+            patient_errors = self.validate_create(patient)
+            if patient_errors:
+                errors[index] = patient_errors
+        return errors
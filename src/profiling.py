@@ -0,0 +1,343 @@
+"""Opt-in per-request profiling of the API."""
+
+import cProfile
+import hmac
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from flask import request, jsonify
+from config import PROFILE_TOP_N, PROFILE_BUFFER_SIZE, PROFILE_SAMPLE_INTERVAL_SECONDS
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stack of one thread at a fixed interval, and counts the
+    stacks in the folded format read by flamegraph tools.
+
+    Attributes:
+        thread_id (int): The identifier of the sampled thread.
+        interval (float): Seconds between samples.
+        stacks (Counter): Folded stack to the number of samples.
+        stopped (Event): Set to stop sampling.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        """
+        Samples the thread until stopped.
+        """
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def folded(self):
+        """
+        Returns the collected stacks in folded format.
+
+        Returns:
+            str: One "frame;frame;frame count" line per distinct stack.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    WSGI middleware that profiles the requests asking for it.
+
+    A request is profiled when it carries the X-Profile header and the admin
+    token, or when ``profile_all`` is set. The whole WSGI call is measured, so
+    the results cover the SQL, the row conversion, jsonify and Flask itself.
+    Each profile keeps the top functions from cProfile and the folded stacks
+    from a StackSampler, in a ring buffer holding the latest ``capacity``
+    profiles. Only one request is profiled at a time; concurrent ones run
+    normally.
+
+    The middleware is only installed when profiling is configured, so there
+    is no cost at all when it is disabled.
+
+    Attributes:
+        wsgi_app (function): The wrapped WSGI application.
+        admin_token (str): The token that enables profiling and its endpoints.
+        profile_all (bool): Whether every request is profiled.
+        top_n (int): The number of functions kept per profile.
+        profiles (deque): The latest profiles, oldest first.
+        next_id (int): The identifier of the next profile.
+        lock (Lock): Ensures a single request is profiled at a time.
+
+    Methods:
+        is_admin(token): Checks an admin token.
+        profile(environ, start_response): Runs and profiles one request.
+        summaries(): Returns the summaries of the stored profiles.
+        top_functions(profiler): Extracts the slowest functions of a profile.
+        store(profile): Adds a profile to the ring buffer.
+        get(profile_id): Returns a stored profile.
+    """
+
+    def __init__(
+        self,
+        wsgi_app,
+        admin_token,
+        profile_all=False,
+        top_n=PROFILE_TOP_N,
+        capacity=PROFILE_BUFFER_SIZE,
+    ):
+        self.wsgi_app = wsgi_app
+        self.admin_token = admin_token
+        self.profile_all = profile_all
+        self.top_n = top_n
+        self.profiles = deque(maxlen=capacity)
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def is_admin(self, token):
+        """
+        Checks an admin token in constant time.
+
+        The tokens are compared as bytes, since compare_digest rejects str
+        values that are not ASCII. Header values are decoded as Latin-1 by the
+        WSGI server, so encoding them back gives the bytes the client sent.
+
+        Args:
+            token (str): The token sent by the client.
+
+        Returns:
+            bool: True if the token is the admin token, False otherwise.
+        """
+        return token is not None and hmac.compare_digest(
+            token.encode("latin-1", "replace"), self.admin_token.encode()
+        )
+
+    def __call__(self, environ, start_response):
+        wanted = self.profile_all or (
+            environ.get("HTTP_X_PROFILE")
+            and self.is_admin(environ.get("HTTP_X_ADMIN_TOKEN"))
+        )
+        # Only one request is profiled at a time; the others run unprofiled
+        # rather than wait, so the lock is not held in a with block.
+        if not wanted or not self.lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self.profile(environ, start_response)
+        finally:
+            self.lock.release()
+
+    def profile(self, environ, start_response):
+        """
+        Runs one request under cProfile and the stack sampler, and stores the
+        resulting profile.
+
+        Args:
+            environ (dict): The WSGI environment.
+            start_response (function): The WSGI start_response callable.
+
+        Returns:
+            list: The response body, fully read inside the profile.
+        """
+        status = []
+
+        def capture_status(response_status, headers, exc_info=None):
+            status.append(response_status)
+            return start_response(response_status, headers, exc_info)
+
+        sampler = StackSampler(threading.get_ident())
+        profiler = cProfile.Profile()
+        started = time.time()
+        sampler.start()
+        profiler.enable()
+        try:
+            iterable = self.wsgi_app(environ, capture_status)
+            try:
+                body = list(iterable)
+            finally:
+                if hasattr(iterable, "close"):
+                    iterable.close()
+        finally:
+            profiler.disable()
+            sampler.stopped.set()
+            sampler.join()
+        self.store(
+            {
+                "method": environ.get("REQUEST_METHOD"),
+                "path": environ.get("PATH_INFO"),
+                "query": environ.get("QUERY_STRING"),
+                "status": status[0] if status else None,
+                "started_at": started,
+                "duration_ms": (time.time() - started) * 1000,
+                "top_functions": self.top_functions(profiler),
+                "folded_stacks": sampler.folded(),
+            }
+        )
+        return body
+
+    def top_functions(self, profiler):
+        """
+        Extracts the functions with the highest cumulative time.
+
+        Args:
+            profiler (Profile): The finished profiler.
+
+        Returns:
+            list: A dictionary per function, highest cumulative time first.
+        """
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_cc, ncalls, tottime, cumtime, _callers) in (
+            stats.stats.items()  # pylint: disable=no-member
+        ):
+            rows.append(
+                {
+                    "function": f"{name} ({filename}:{line})",
+                    "calls": ncalls,
+                    "total_ms": tottime * 1000,
+                    "cumulative_ms": cumtime * 1000,
+                }
+            )
+        rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return rows[: self.top_n]
+
+    def store(self, profile):
+        """
+        Adds a profile to the ring buffer, dropping the oldest when full. Only
+        called while the profiling lock is held.
+
+        Args:
+            profile (dict): The profile to store.
+        """
+        profile["id"] = self.next_id
+        self.next_id += 1
+        self.profiles.append(profile)
+
+    def summaries(self):
+        """
+        Returns the summaries of the stored profiles.
+
+        Returns:
+            list: A dictionary per profile without its stats, newest first.
+        """
+        fields = ("id", "method", "path", "query", "status", "started_at", "duration_ms")
+        return [
+            {field: profile[field] for field in fields}
+            for profile in reversed(list(self.profiles))
+        ]
+
+    def get(self, profile_id):
+        """
+        Returns a stored profile.
+
+        Args:
+            profile_id (int): The identifier of the profile.
+
+        Returns:
+            dict: The profile, or None if it is not stored (anymore).
+        """
+        for profile in list(self.profiles):
+            if profile["id"] == profile_id:
+                return profile
+        return None
+
+
+class ProfileAPIController:
+    """
+    Serves the stored request profiles on the /admin/profiles endpoints, to
+    clients sending the admin token.
+
+    Attributes:
+        app (Flask): The Flask application instance.
+        profiler (RequestProfiler): The profiling middleware keeping the profiles.
+
+    Methods:
+        setup_routes(): Sets up the routes for the profile endpoints.
+        admin_denied(): Checks the admin token of the current request.
+        get_profiles(): Lists the stored request profiles.
+        get_profile(profile_id): Retrieves a stored request profile.
+        get_profile_folded(profile_id): Retrieves the folded stacks of a profile.
+    """
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+        self.setup_routes()
+
+    def setup_routes(self):
+        """
+        Sets up the routes for the profile endpoints.
+        """
+        self.app.route("/admin/profiles", methods=["GET"])(self.get_profiles)
+        self.app.route("/admin/profiles/<int:profile_id>", methods=["GET"])(
+            self.get_profile
+        )
+        self.app.route("/admin/profiles/<int:profile_id>/folded", methods=["GET"])(
+            self.get_profile_folded
+        )
+
+    def admin_denied(self):
+        """
+        Checks the admin token of the current request.
+
+        Returns:
+            tuple: A 403 response if the token is missing or wrong, otherwise None.
+        """
+        if self.profiler.is_admin(request.headers.get("X-Admin-Token")):
+            return None
+        return jsonify({"result": "failure", "reason": "Admin token required"}), 403
+
+    def get_profiles(self):
+        """
+        Lists the stored request profiles, newest first.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        return self.admin_denied() or (jsonify(self.profiler.summaries()), 200)
+
+    def get_profile(self, profile_id):
+        """
+        Retrieves a stored request profile with its slowest functions.
+
+        Args:
+            profile_id (int): The ID of the profile.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        denied = self.admin_denied()
+        if denied:
+            return denied
+        profile = self.profiler.get(profile_id)
+        if profile is None:
+            return jsonify({"result": "failure", "reason": "Profile not found"}), 404
+        return jsonify(profile), 200
+
+    def get_profile_folded(self, profile_id):
+        """
+        Retrieves the sampled stacks of a stored request profile in the folded
+        format read by flamegraph tools.
+
+        Args:
+            profile_id (int): The ID of the profile.
+
+        Returns:
+            tuple: A tuple containing the response data and status code.
+        """
+        denied = self.admin_denied()
+        if denied:
+            return denied
+        profile = self.profiler.get(profile_id)
+        if profile is None:
+            return jsonify({"result": "failure", "reason": "Profile not found"}), 404
+        return profile["folded_stacks"], 200, {"Content-Type": "text/plain"}